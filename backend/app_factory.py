@@ -0,0 +1,556 @@
+"""Фабрика Flask-приложения олимпиады.
+
+Профили:
+- ``olympiad`` — полный режим: ID участников, сессии, прогресс, результаты,
+  админка, снапшоты, фоновые задачи и раздача фронтенда;
+- ``practice`` — тренировка без состояния: вопросы, проверка ответов,
+  подсказки и итог с оценкой. Ничего не пишет на диск и не хранит между
+  запросами, поэтому экземпляров можно запускать сколько угодно.
+
+Оба профиля проверяют ответы одним ядром из grading.py: вопросы
+разбираются и компилируются один раз на процесс.
+"""
+from flask import Flask, Response, jsonify, request, send_file
+from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
+import os
+import io
+import csv
+import atexit
+import threading
+from datetime import datetime
+
+from storage import create_storage, result_to_csv_row, RESULTS_CSV_HEADER
+from rate_limit import RateLimiter
+from grading import QuestionSet, AnswerCache, Grader
+from static_assets import StaticAssetIndex
+from profiling import RequestProfiler
+from snapshot import SnapshotScheduler, SnapshotError
+from jobs import JobManager, DEFAULT_CHUNK_SIZE
+
+# Определяем путь к build папке
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BUILD_DIR = os.path.join(BASE_DIR, '..', 'frontend', 'build')
+
+PROFILES = ('olympiad', 'practice')
+
+# Поверх default_config(); явно переданный config важнее
+PROFILE_DEFAULTS = {
+    'olympiad': {},
+    # Вопросы читаются один раз при старте, дальше — никакого обращения к диску
+    'practice': {'QUESTIONS_CHECK_INTERVAL': None},
+}
+
+
+def default_config():
+    """Настройки по умолчанию (с учетом переменных окружения)"""
+    return {
+        'PROFILE': os.environ.get('APP_PROFILE', 'olympiad'),
+        'QUESTIONS_FILE': "questions.txt",
+        'QUESTIONS_CHECK_INTERVAL': float(os.environ.get('QUESTIONS_CHECK_INTERVAL', 5)),
+        'ANSWER_CACHE_SIZE': int(os.environ.get('ANSWER_CACHE_SIZE', 8192)),
+        # Без прокси X-Forwarded-For подделывает сам клиент, поэтому по умолчанию 0;
+        # на Render/Railway (1 прокси) задается в render.yaml, railway.json и Procfile
+        'TRUSTED_PROXY_HOPS': int(os.environ.get('TRUSTED_PROXY_HOPS', 0)),
+        # Хранилище выбирается через STORAGE_BACKEND (file, sqlite, memory)
+        'STORAGE_BACKEND': os.environ.get('STORAGE_BACKEND'),
+        'RESULTS_FILE': "results.csv",
+        'RESULTS_JSON_FILE': "results.json",
+        'VALID_IDS_FILE': "valid_ids.txt",
+        'USED_IDS_FILE': "used_ids.txt",
+        'PROGRESS_FILE': "progress.json",
+        'ACTIVE_SESSIONS_FILE': "active_sessions.txt",
+        # Снапшот лучше держать на постоянном диске платформы; пустая строка — отключить
+        'SNAPSHOT_PATH': os.environ.get('SNAPSHOT_PATH', 'olympiad.snapshot.gz'),
+        'SNAPSHOT_INTERVAL': float(os.environ.get('SNAPSHOT_INTERVAL', 60)),
+        'JOBS_DIR': os.environ.get('JOBS_DIR', 'jobs'),
+        'JOB_WORKERS': int(os.environ.get('JOB_WORKERS', 0)) or None,
+        'JOB_CHUNK_SIZE': int(os.environ.get('JOB_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)),
+        'BUILD_DIR': BUILD_DIR,
+    }
+
+
+_graders = {}
+_graders_lock = threading.Lock()
+
+
+def get_grader(filename, check_interval, cache_size):
+    """Общий на процесс Grader для файла вопросов и его настроек.
+
+    Приложения в одном процессе с одинаковыми настройками делят разобранные
+    вопросы, скомпилированные проверки и кэш ответов.
+    """
+    key = (os.path.abspath(filename), check_interval, cache_size)
+    with _graders_lock:
+        grader = _graders.get(key)
+        if grader is None:
+            question_set = QuestionSet(filename, check_interval=check_interval)
+            grader = _graders[key] = Grader(question_set, AnswerCache(cache_size))
+        return grader
+
+
+def score_answers(grader, user_answers):
+    """Считает баллы за ответы {id вопроса: ответ}: (баллы, максимум, детали)"""
+    bank = grader.refresh()
+    questions = bank.questions
+    total_score = 0
+    details = []
+
+    for question_id_str, user_answer in user_answers.items():
+        question_id = int(question_id_str)
+        position = bank.position(question_id)
+        if position is not None:
+            question = questions[position]
+            is_correct = grader.grade(question_id, user_answer, bank)
+            if is_correct:
+                total_score += question['score']
+
+            details.append({
+                'question_id': question_id,
+                'title': question['title'],
+                'user_answer': user_answer,
+                'correct': is_correct,
+                'score': question['score'] if is_correct else 0
+            })
+
+    return total_score, bank.max_score, details
+
+
+def practice_grade(percent):
+    """Оценка для тренировочного режима"""
+    if percent >= 80:
+        return "Отлично!"
+    elif percent >= 60:
+        return "Хорошо!"
+    return "Попробуйте ещё раз!"
+
+
+def create_app(config=None):
+    """Создает приложение; config дополняет настройки профиля config['PROFILE']"""
+    config = config or {}
+    profile = config.get('PROFILE') or default_config()['PROFILE']
+    if profile not in PROFILES:
+        raise ValueError(f"Неизвестный профиль: {profile}")
+    settings = {**default_config(), **PROFILE_DEFAULTS[profile], **config, 'PROFILE': profile}
+
+    app = Flask(__name__, static_folder=None)
+    app.config.update(settings)
+    CORS(app)
+
+    if settings['TRUSTED_PROXY_HOPS']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=settings['TRUSTED_PROXY_HOPS'])
+
+    grader = get_grader(settings['QUESTIONS_FILE'], settings['QUESTIONS_CHECK_INTERVAL'],
+                        settings['ANSWER_CACHE_SIZE'])
+    limiter = RateLimiter.from_env()
+
+    register_quiz_routes(app, grader, limiter)
+    if settings['PROFILE'] == 'practice':
+        register_practice_routes(app, grader)
+    else:
+        register_olympiad_routes(app, grader, limiter)
+    return app
+
+
+def register_quiz_routes(app, grader, limiter):
+    """Вопросы, проверка ответа и подсказки — общие для всех профилей"""
+
+    @app.route('/api/questions', methods=['GET'])
+    def get_questions():
+        """Возвращает все вопросы (без ответов)"""
+        questions_without_answers = []
+        for q in grader.refresh().questions:
+            q_copy = q.copy()
+            q_copy.pop('answer', None)
+            questions_without_answers.append(q_copy)
+        return jsonify(questions_without_answers)
+
+    @app.route('/api/check-answer', methods=['POST'])
+    @limiter.limit('check_answer')
+    def check_answer_endpoint():
+        """Проверяет ответ пользователя (user_id в теле необязателен, по нему считается лимит)"""
+        data = request.json
+        question_id = data.get('question_id')
+        user_answer = data.get('answer', '')
+
+        bank = grader.refresh()
+        position = bank.position(question_id)
+        if position is None:
+            return jsonify({'error': 'Invalid question ID'}), 400
+
+        question = bank.questions[position]
+        is_correct = grader.grade(question_id, user_answer, bank)
+
+        return jsonify({
+            'correct': is_correct,
+            'score': question['score'] if is_correct else 0
+        })
+
+    @app.route('/api/hint/<int:question_id>', methods=['GET'])
+    def get_hint(question_id):
+        """Возвращает подсказку для вопроса"""
+        bank = grader.refresh()
+        position = bank.position(question_id)
+        if position is None:
+            return jsonify({'error': 'Invalid question ID'}), 400
+
+        return jsonify({'hint': bank.questions[position].get('hint', 'Подсказка недоступна.')})
+
+
+def register_practice_routes(app, grader):
+    """Итог тренировки: только подсчет, без сохранения"""
+
+    @app.route('/api/result', methods=['POST'])
+    def calculate_result():
+        """Вычисляет итоговый результат"""
+        data = request.json
+        total_score, max_score, _ = score_answers(grader, data.get('answers', {}))
+        percent = (total_score / max_score * 100) if max_score > 0 else 0
+
+        return jsonify({
+            'score': total_score,
+            'max_score': max_score,
+            'percent': round(percent, 1),
+            'grade': practice_grade(percent)
+        })
+
+
+def register_olympiad_routes(app, grader, limiter):
+    """ID участников, сессии, прогресс, результаты, админка и фронтенд"""
+    config = app.config
+    question_set = grader.question_set
+
+    # Выборочное профилирование: PROFILE_SAMPLE_RATE или /api/admin/profiling
+    profiler = RequestProfiler.from_env()
+    profiler.init_app(app)
+
+    storage = create_storage(
+        config['STORAGE_BACKEND'],
+        valid_ids_file=config['VALID_IDS_FILE'],
+        used_ids_file=config['USED_IDS_FILE'],
+        sessions_file=config['ACTIVE_SESSIONS_FILE'],
+        progress_file=config['PROGRESS_FILE'],
+        results_file=config['RESULTS_FILE'],
+        results_json_file=config['RESULTS_JSON_FILE'],
+    )
+    atexit.register(storage.close)
+
+    # Если после рестарта данные пропали, поднимаем их из последнего снапшота
+    snapshot_path = config['SNAPSHOT_PATH']
+    snapshots = None
+    if snapshot_path:
+        snapshots = SnapshotScheduler(storage, snapshot_path,
+                                      interval=config['SNAPSHOT_INTERVAL'],
+                                      questions_version=lambda: question_set.version)
+        try:
+            snapshots.restore_if_empty()
+        except SnapshotError as e:
+            app.logger.error("Снапшот не восстановлен: %s", e)
+        snapshots.start()
+        atexit.register(snapshots.stop)
+
+    # Тяжелые задачи админки (статистика, экспорт, перепроверка) — в пуле процессов
+    jobs = JobManager(storage, question_set,
+                      jobs_dir=config['JOBS_DIR'],
+                      max_workers=config['JOB_WORKERS'],
+                      chunk_size=config['JOB_CHUNK_SIZE'])
+    atexit.register(jobs.shutdown)
+
+    app.extensions['olympiad'] = {'storage': storage, 'snapshots': snapshots,
+                                  'jobs': jobs, 'profiler': profiler}
+
+    def is_id_valid(user_id):
+        """Проверяет, валиден ли ID и не использован ли он"""
+        if not storage.is_valid_id(user_id):
+            return False, "Неверный ID"
+
+        if storage.is_used_id(user_id):
+            return False, "Этот ID уже был использован. Тест завершен."
+
+        # Проверяем активные сессии
+        if storage.is_session_active(user_id):
+            return False, "Кто-то уже решает тест под этим ID. Подождите или обратитесь к организатору."
+
+        return True, "OK"
+
+    @app.route('/api/validate-id', methods=['POST'])
+    @limiter.limit('validate_id')
+    def validate_id():
+        """Проверяет валидность ID и создает активную сессию"""
+        data = request.json
+        user_id = data.get('user_id', '').strip()
+
+        is_valid, message = is_id_valid(user_id)
+
+        if is_valid:
+            # Создаем активную сессию (НЕ блокируем навсегда!)
+            storage.add_session(user_id)
+
+        return jsonify({
+            'valid': is_valid,
+            'message': message
+        })
+
+    @app.route('/api/heartbeat', methods=['POST'])
+    def heartbeat():
+        """Обновляет heartbeat для активной сессии"""
+        data = request.json
+        user_id = data.get('user_id', '').strip()
+
+        if storage.touch_session(user_id):
+            return jsonify({'success': True})
+        else:
+            return jsonify({'success': False, 'message': 'Сессия не найдена'}), 404
+
+    @app.route('/api/save-progress', methods=['POST'])
+    @limiter.limit('save_progress')
+    def save_progress():
+        """Сохраняет прогресс пользователя на сервере"""
+        data = request.json
+        user_id = data.get('user_id', '').strip()
+
+        if not user_id:
+            return jsonify({'error': 'User ID required'}), 400
+
+        progress_data = {
+            'user_id': user_id,
+            'current_index': data.get('current_index', 0),
+            'user_answers': data.get('user_answers', {}),
+            'question_timers': data.get('question_timers', {}),
+            'timestamp': datetime.now().isoformat()
+        }
+
+        storage.save_progress(user_id, progress_data)
+
+        return jsonify({'success': True})
+
+    @app.route('/api/get-progress/<user_id>', methods=['GET'])
+    def get_progress(user_id):
+        """Получает сохраненный прогресс пользователя"""
+        progress = storage.get_progress(user_id)
+
+        if progress:
+            # Проверяем что прогресс не старше 24 часов
+            timestamp = datetime.fromisoformat(progress['timestamp'])
+            hours_passed = (datetime.now() - timestamp).total_seconds() / 3600
+
+            if hours_passed < 24:
+                return jsonify({'progress': progress})
+
+        return jsonify({'progress': None})
+
+    @app.route('/api/result', methods=['POST'])
+    def calculate_result():
+        """Вычисляет итоговый результат и сохраняет его"""
+        data = request.json
+        user_id = data.get('user_id', 'Неизвестный')
+        total_time = data.get('total_time', 0)  # Время в секундах
+
+        total_score, max_score, details = score_answers(grader, data.get('answers', {}))
+        percent = (total_score / max_score * 100) if max_score > 0 else 0
+
+        # Форматируем время
+        time_minutes = total_time // 60
+        time_seconds = total_time % 60
+        time_formatted = f"{time_minutes}:{time_seconds:02d}"
+
+        # Сохранение результата (CSV/JSON или база — в зависимости от хранилища)
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        storage.append_result({
+            'timestamp': timestamp,
+            'user_id': user_id,
+            'score': total_score,
+            'max_score': max_score,
+            'percent': round(percent, 1),
+            'time': time_formatted,
+            'time_seconds': total_time,
+            'details': details
+        })
+
+        # Блокируем ID НАВСЕГДА и удаляем активную сессию
+        storage.mark_id_as_used(user_id)
+        storage.remove_session(user_id)
+
+        return jsonify({
+            'score': total_score,
+            'max_score': max_score,
+            'percent': round(percent, 1)
+        })
+
+    @app.route('/api/admin/sessions', methods=['GET'])
+    def get_admin_sessions():
+        """Получить активные сессии и использованные ID для админ-панели"""
+        sessions = storage.list_sessions()
+        used_ids = storage.list_used_ids()
+
+        active_list = []
+        for user_id, timestamp in sessions.items():
+            active_list.append({
+                'user_id': user_id,
+                'timestamp': timestamp.isoformat(),
+                'duration': str(datetime.now() - timestamp).split('.')[0]  # Форматируем длительность
+            })
+
+        return jsonify({
+            'active_sessions': active_list,
+            'used_ids': list(used_ids),
+            'total_active': len(active_list),
+            'total_used': len(used_ids),
+            'total_valid': storage.count_valid_ids()
+        })
+
+    @app.route('/api/admin/grading-cache', methods=['GET'])
+    def get_grading_cache_stats():
+        """Статистика кэша проверки ответов"""
+        stats = grader.cache.stats()
+        stats['questions_version'] = question_set.version
+        return jsonify(stats)
+
+    @app.route('/api/admin/profiling', methods=['GET', 'POST'])
+    def admin_profiling():
+        """Статус профилировщика; POST включает/выключает его и меняет параметры"""
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            try:
+                profiler.configure(
+                    enabled=data.get('enabled'),
+                    sample_rate=data.get('sample_rate'),
+                    interval=data['interval_ms'] / 1000 if data.get('interval_ms') is not None else None
+                )
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Некорректные параметры профилирования'}), 400
+            if data.get('reset'):
+                profiler.reset()
+        return jsonify(profiler.stats())
+
+    @app.route('/api/admin/profiling/collapsed', methods=['GET'])
+    def admin_profiling_collapsed():
+        """Профили в формате collapsed stacks (для flamegraph.pl / speedscope)"""
+        return Response(profiler.collapsed(request.args.get('route')), mimetype='text/plain')
+
+    @app.route('/api/admin/snapshot', methods=['GET', 'POST'])
+    def admin_snapshot():
+        """Статус снапшотов; POST пишет снапшот немедленно"""
+        if not snapshots:
+            return jsonify({'error': 'Снапшоты отключены (snapshot_path пустой)'}), 404
+        if request.method == 'POST':
+            snapshots.snapshot_now()
+        return jsonify(snapshots.status())
+
+    @app.route('/api/admin/snapshot/restore', methods=['POST'])
+    def admin_snapshot_restore():
+        """Восстанавливает состояние из снапшота (только в пустое хранилище)"""
+        if not snapshots:
+            return jsonify({'error': 'Снапшоты отключены (snapshot_path пустой)'}), 404
+        data = request.get_json(silent=True) or {}
+        path = snapshot_path + '.before-clear' if data.get('source') == 'before-clear' else snapshot_path
+
+        if not os.path.exists(path):
+            return jsonify({'success': False, 'message': 'Снапшот не найден'}), 404
+        if not storage.is_empty():
+            return jsonify({'success': False, 'message': 'Сначала очистите результаты'}), 409
+        try:
+            restored = snapshots.restore(path)
+        except SnapshotError as e:
+            return jsonify({'success': False, 'message': str(e)}), 500
+        return jsonify({'success': True, **restored})
+
+    @app.route('/api/admin/jobs', methods=['GET', 'POST'])
+    def admin_jobs():
+        """Список фоновых задач; POST {"type": "stats" | "export" | "regrade"} ставит новую"""
+        if request.method == 'GET':
+            return jsonify({'jobs': jobs.list()})
+        data = request.get_json(silent=True) or {}
+        try:
+            job = jobs.submit(data.get('type'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(job.to_dict()), 202
+
+    @app.route('/api/admin/jobs/<job_id>', methods=['GET'])
+    def admin_job_status(job_id):
+        """Статус и результат фоновой задачи"""
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Задача не найдена'}), 404
+        return jsonify(job.to_dict())
+
+    @app.route('/api/admin/jobs/<job_id>/download', methods=['GET'])
+    def admin_job_download(job_id):
+        """Файл, подготовленный задачей export или regrade"""
+        job = jobs.get(job_id)
+        if job is None or job.status != 'done' or not job.file:
+            return jsonify({'error': 'Файл задачи не готов'}), 404
+        download_name = 'quiz_results.csv' if job.kind == 'export' else 'regraded_results.json'
+        return send_file(os.path.abspath(job.file), as_attachment=True, download_name=download_name)
+
+    @app.route('/api/admin/clear-results', methods=['POST'])
+    def clear_results():
+        """Очистить все результаты и использованные ID"""
+        try:
+            # Страховка: состояние до очистки можно вернуть через /api/admin/snapshot/restore
+            if snapshots:
+                snapshots.snapshot_now(snapshot_path + '.before-clear')
+            storage.clear()
+
+            return jsonify({'success': True, 'message': 'Все данные очищены'})
+        except Exception as e:
+            return jsonify({'success': False, 'message': str(e)}), 500
+
+    @app.route('/api/results/download', methods=['GET'])
+    def download_results():
+        """Скачать результаты в CSV"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(RESULTS_CSV_HEADER)
+        for result in storage.list_results():
+            writer.writerow(result_to_csv_row(result))
+        data = io.BytesIO(buffer.getvalue().encode('utf-8-sig'))
+        return send_file(data, mimetype='text/csv', as_attachment=True, download_name='quiz_results.csv')
+
+    @app.route('/api/results/json', methods=['GET'])
+    def get_results_json():
+        """Получить результаты в JSON"""
+        return jsonify(storage.list_results())
+
+    @app.route('/api/results/stats', methods=['GET'])
+    def get_stats():
+        """Получить статистику по всем результатам"""
+        results = storage.list_results()
+
+        if not results:
+            return jsonify({'total_users': 0, 'average_score': 0, 'average_percent': 0})
+
+        total_users = len(results)
+        average_score = sum(r['score'] for r in results) / total_users
+        average_percent = sum(r['percent'] for r in results) / total_users
+
+        return jsonify({
+            'total_users': total_users,
+            'average_score': round(average_score, 1),
+            'average_percent': round(average_percent, 1),
+            'results': results
+        })
+
+    @app.route('/results_viewer.html')
+    def results_viewer():
+        """Отдает страницу просмотра результатов"""
+        return send_file('results_viewer.html')
+
+    @app.route('/admin.html')
+    def admin_panel():
+        """Отдает админ-панель"""
+        return send_file('admin.html')
+
+    # Serve React App: файлы сборки индексируются и сжимаются один раз при старте
+    static_assets = StaticAssetIndex(config['BUILD_DIR'])
+
+    @app.route('/')
+    def serve():
+        """Отдает главную страницу React"""
+        return static_assets.serve('index.html')
+
+    @app.route('/<path:path>')
+    def serve_static(path):
+        """Отдает статические файлы React"""
+        return static_assets.serve(path)
@@ -0,0 +1,125 @@
+"""Атомарная запись файлов: временный файл -> fsync -> os.replace.
+
+Если процесс убьют посреди записи, на диске останется либо старая, либо
+новая версия файла, но не обрезанная. fsync дорогой, поэтому для частых
+перезаписей (прогресс, сессии) он выполняется пачкой — не чаще раза в
+``fsync_interval`` секунд; важные файлы (результаты, использованные ID)
+пишутся с ``durable=True`` и синхронизируются сразу.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+FSYNC_INTERVAL = 1.0
+
+
+def _fsync_dir(path):
+    """fsync каталога, чтобы переименование пережило сбой питания (POSIX)"""
+    if os.name != 'posix':
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _ends_with_newline(path):
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+class AtomicWriter:
+    """Атомарная запись с пакетным fsync"""
+
+    def __init__(self, fsync_interval=FSYNC_INTERVAL):
+        self.fsync_interval = fsync_interval
+        self._pending = set()
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+
+    def write(self, path, write_func, durable=False, encoding='utf-8', newline=None, binary=False):
+        """Пишет файл через write_func(f) во временный файл и подменяет им path"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+        sync_now = durable or self._sync_due()
+        try:
+            # mkstemp создает файл с правами 0600 — сохраняем права исходного файла
+            try:
+                os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+            except FileNotFoundError:
+                os.chmod(tmp_path, 0o644)
+            text_options = {} if binary else {'encoding': encoding, 'newline': newline}
+            with os.fdopen(fd, 'wb' if binary else 'w', **text_options) as f:
+                write_func(f)
+                f.flush()
+                if sync_now:
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if sync_now:
+            _fsync_dir(path)
+            self.flush()
+        else:
+            with self._lock:
+                self._pending.add(path)
+
+    def write_text(self, path, text, durable=False, encoding='utf-8'):
+        self.write(path, lambda f: f.write(text), durable=durable, encoding=encoding)
+
+    def write_json(self, path, data, durable=False, indent=None):
+        self.write(path, lambda f: json.dump(data, f, ensure_ascii=False, indent=indent), durable=durable)
+
+    def append(self, path, write_func, durable=True, encoding='utf-8', newline=None):
+        """Дописывает строки в конец файла (для журналов вроде results.csv).
+
+        Если последняя строка недописана (процесс упал посреди записи),
+        новые данные начинаются с новой строки и не склеиваются с ней.
+        """
+        with open(path, 'a', encoding=encoding, newline=newline) as f:
+            if f.tell() and not _ends_with_newline(path):
+                f.write('\n')
+            write_func(f)
+            f.flush()
+            if durable:
+                os.fsync(f.fileno())
+
+    def _sync_due(self):
+        return time.monotonic() - self._last_sync >= self.fsync_interval
+
+    def flush(self):
+        """fsync всех файлов, записанных без немедленной синхронизации"""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+            self._last_sync = time.monotonic()
+        for path in pending:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        if pending:
+            _fsync_dir(next(iter(pending)))
+
+
+def write_json_array(f, items, indent=2):
+    """Потоково пишет итератор словарей как JSON-массив"""
+    pad = ' ' * indent
+    f.write('[')
+    first = True
+    for item in items:
+        f.write('\n' if first else ',\n')
+        first = False
+        body = json.dumps(item, ensure_ascii=False, indent=indent)
+        f.write(pad + body.replace('\n', '\n' + pad))
+    f.write('\n]' if not first else ']')
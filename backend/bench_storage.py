@@ -0,0 +1,113 @@
+"""
+Бенчмарк хранилищ: один и тот же сценарий олимпиады для каждого бэкенда.
+
+Запуск:
+    python bench_storage.py                 # все бэкенды, 500 участников
+    python bench_storage.py sqlite memory   # только выбранные
+    BENCH_USERS=5000 python bench_storage.py
+"""
+import os
+import sys
+import shutil
+import tempfile
+import time
+import statistics
+
+from storage import create_storage, BACKENDS
+
+NUM_USERS = int(os.environ.get('BENCH_USERS', 500))
+PROGRESS_SAVES = int(os.environ.get('BENCH_PROGRESS_SAVES', 10))
+
+
+def run_scenario(storage, user_ids):
+    """Прогоняет сценарий и возвращает время каждой операции по типам"""
+    timings = {'validate': [], 'heartbeat': [], 'progress': [], 'result': [], 'admin': []}
+
+    def timed(kind, func, *args):
+        start = time.perf_counter()
+        value = func(*args)
+        timings[kind].append(time.perf_counter() - start)
+        return value
+
+    for user_id in user_ids:
+        timed('validate', lambda: storage.is_valid_id(user_id) and not storage.is_used_id(user_id)
+              and not storage.is_session_active(user_id))
+        timed('validate', storage.add_session, user_id)
+
+    for step in range(PROGRESS_SAVES):
+        for user_id in user_ids:
+            timed('heartbeat', storage.touch_session, user_id)
+            timed('progress', storage.save_progress, user_id, {
+                'user_id': user_id,
+                'current_index': step,
+                'user_answers': {str(i): str(i * 7) for i in range(step)},
+                'question_timers': {},
+                'timestamp': '2025-01-01T10:00:00'
+            })
+        timed('admin', storage.list_sessions)
+
+    for user_id in user_ids:
+        timed('result', storage.append_result, {
+            'timestamp': '2025-01-01 10:30:00',
+            'user_id': user_id,
+            'score': 42,
+            'max_score': 200,
+            'percent': 21.0,
+            'time': '30:00',
+            'time_seconds': 1800,
+            'details': []
+        })
+        timed('result', storage.mark_id_as_used, user_id)
+        timed('result', storage.remove_session, user_id)
+
+    timed('admin', storage.list_results)
+    storage.flush()
+    return timings
+
+
+def bench(backend):
+    workdir = tempfile.mkdtemp(prefix=f'bench_{backend}_')
+    try:
+        user_ids = [f"{i:05d}" for i in range(NUM_USERS)]
+        valid_ids_file = os.path.join(workdir, 'valid_ids.txt')
+        with open(valid_ids_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(user_ids) + '\n')
+
+        storage = create_storage(
+            backend,
+            valid_ids_file=valid_ids_file,
+            valid_ids_index=os.path.join(workdir, 'valid_ids.idx'),
+            used_ids_file=os.path.join(workdir, 'used_ids.txt'),
+            sessions_file=os.path.join(workdir, 'active_sessions.txt'),
+            progress_file=os.path.join(workdir, 'progress.json'),
+            results_file=os.path.join(workdir, 'results.csv'),
+            results_json_file=os.path.join(workdir, 'results.json'),
+            **({'path': os.path.join(workdir, 'bench.db')} if backend == 'sqlite' else {})
+        )
+        start = time.perf_counter()
+        timings = run_scenario(storage, user_ids)
+        total = time.perf_counter() - start
+        storage.close()
+        return total, timings
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    backends = sys.argv[1:] or list(BACKENDS)
+    print(f"Участников: {NUM_USERS}, сохранений прогресса на участника: {PROGRESS_SAVES}")
+    print(f"{'бэкенд':<8} {'всего, с':>9}  " + '  '.join(f"{k + ' p50/p99, мс':>24}" for k in
+                                                     ('validate', 'heartbeat', 'progress', 'result')))
+    for backend in backends:
+        total, timings = bench(backend)
+        cells = []
+        for kind in ('validate', 'heartbeat', 'progress', 'result'):
+            values = sorted(timings[kind])
+            p50 = statistics.median(values) * 1000
+            p99 = values[int(len(values) * 0.99) - 1] * 1000
+            cells.append(f"{p50:>11.3f}/{p99:<12.3f}")
+        print(f"{backend:<8} {total:>9.2f}  " + '  '.join(cells))
+
+
+if __name__ == '__main__':
+    main()
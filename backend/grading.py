@@ -0,0 +1,477 @@
+"""Загрузка вопросов и проверка ответов.
+
+``QuestionSet`` держит актуальный список вопросов и его версию (хэш
+содержимого questions.txt) и перечитывает файл, когда тот меняется.
+``Grader`` проверяет ответы через ограниченный LRU-кэш ``AnswerCache``:
+ключ — (id вопроса, нормализованный ответ, версия набора вопросов).
+
+Способ проверки задается ключом ``type:`` вопроса и компилируется при
+загрузке (см. ``compile_matcher``):
+
+* ``text`` (по умолчанию) — точный текст без пробелов и регистра или число
+  с допуском ``tolerance:``; варианты разделяются «или» и «|»;
+* ``ordered`` / ``unordered`` — список через запятую (или пробел) с учетом
+  или без учета порядка;
+* ``range`` — число в диапазоне ``answer: 10..20``;
+* ``regex`` — регулярное выражение на весь ответ;
+* ``fuzzy`` — текст с опечатками, не больше ``max_distance:`` правок.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+logger = logging.getLogger(__name__)
+
+def load_questions_from_txt(filename):
+    """Загружает вопросы из текстового файла"""
+    if not os.path.exists(filename):
+        return []
+
+    with open(filename, "r", encoding="utf-8") as f:
+        return parse_questions(f.read())
+
+def parse_questions(content):
+    """Разбирает текст questions.txt в список вопросов"""
+    return [q for q, _ in parse_questions_with_matchers(content)]
+
+def parse_questions_with_matchers(content):
+    """Разбирает questions.txt в список пар (вопрос, объект проверки ответа).
+
+    Блоки с ошибками пропускаются с предупреждением в лог. id вопроса — номер
+    его блока, поэтому пропуск блока не сдвигает id следующих вопросов.
+    """
+    content = content.strip()
+    if not content:
+        return []
+
+    blocks = [block.strip() for block in content.split('---') if block.strip()]
+    questions = []
+
+    for i, block in enumerate(blocks):
+        lines = [line.rstrip() for line in block.splitlines()]
+
+        q = {}
+        current_key = None
+        current_value_lines = []
+
+        for line in lines:
+            if not line.strip():
+                continue
+
+            key_match = None
+            for key in ['title', 'text', 'answer', 'score', 'time_limit', 'hint', 'type', 'tolerance', 'max_distance']:
+                if line.strip().lower().startswith(key + ':'):
+                    key_match = key
+                    break
+
+            if key_match:
+                if current_key:
+                    value = '\n'.join(current_value_lines).strip()
+                    q[current_key] = value
+                    current_value_lines = []
+
+                parts = line.split(':', 1)
+                current_key = key_match.lower()
+                value_part = parts[1].strip() if len(parts) > 1 else ""
+                current_value_lines = [value_part]
+
+            else:
+                if current_key:
+                    current_value_lines.append(line)
+
+        if current_key:
+            value = '\n'.join(current_value_lines).strip()
+            q[current_key] = value
+
+        q.setdefault('title', f"Вопрос {i+1}")
+        q.setdefault('hint', "Подсказка недоступна.")
+        q.setdefault('score', 1)
+        q.setdefault('time_limit', 60)
+
+        if 'text' not in q or not q['text'].strip():
+            logger.warning("questions.txt: блок %d пропущен — нет text:", i + 1)
+            continue
+        if 'answer' not in q or not q['answer'].strip():
+            logger.warning("questions.txt: блок %d пропущен — нет answer:", i + 1)
+            continue
+
+        try:
+            q['score'] = int(q['score'])
+            q['time_limit'] = int(q['time_limit'])
+            q['type'] = q.get('type', 'text').strip().lower() or 'text'
+            matcher = compile_matcher(q)
+        except ValueError as e:
+            logger.warning("questions.txt: блок %d (%s) пропущен — %s", i + 1, q['title'], e)
+            continue
+
+        q['id'] = i
+        questions.append((q, matcher))
+
+    return questions
+
+MAX_ANSWER_LENGTH = 500
+DEFAULT_TOLERANCE = 0.01
+OPTION_SEPARATOR = re.compile(r"\s+или\s+|\|")
+ITEM_SEPARATOR = re.compile(r"[,;]")
+
+def normalize_text(s):
+    """Нормализация для текстовых сравнений"""
+    return s.strip().lower().replace(" ", "")
+
+def to_number(s):
+    """Преобразует строку в число"""
+    try:
+        return float(s.replace(",", "."))
+    except (ValueError, AttributeError):
+        return None
+
+def split_options(answer):
+    """Разбивает правильный ответ на варианты («или», «|»)"""
+    return [opt.strip() for opt in OPTION_SEPARATOR.split(answer.strip()) if opt.strip()]
+
+def split_items(s):
+    """Разбивает ответ-список на элементы: по запятым, а если их нет — по пробелам"""
+    items = ITEM_SEPARATOR.split(s) if ITEM_SEPARATOR.search(s) else s.split()
+    return tuple(normalize_text(item) for item in items if item.strip())
+
+def bounded_levenshtein(a, b, limit):
+    """Расстояние Левенштейна, если оно не больше limit, иначе limit + 1.
+
+    Считается только полоса шириной 2 * limit + 1 вокруг диагонали, и в
+    памяти хранится только она, поэтому стоимость O(limit * len) вместо
+    O(len * len).
+    """
+    over = limit + 1
+    if abs(len(a) - len(b)) > limit:
+        return over
+    if len(a) > len(b):
+        a, b = b, a
+    n, m = len(a), len(b)
+    width = 2 * limit + 1
+
+    # Ячейка k строки i — это столбец j = i - limit + k
+    prev = [k - limit if 0 <= k - limit <= m else over for k in range(width)]
+    for i in range(1, n + 1):
+        cur = [over] * width
+        row_min = over
+        ch = a[i - 1]
+        for k in range(width):
+            j = i - limit + k
+            if j < 0 or j > m:
+                continue
+            if j == 0:
+                value = i if i <= limit else over
+            else:
+                value = prev[k] + (ch != b[j - 1])
+                if k + 1 < width and prev[k + 1] + 1 < value:
+                    value = prev[k + 1] + 1
+                if k > 0 and cur[k - 1] + 1 < value:
+                    value = cur[k - 1] + 1
+                if value > over:
+                    value = over
+            cur[k] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return over
+        prev = cur
+    return min(prev[m - n + limit], over)
+
+class TextMatcher:
+    """Точный текст (без пробелов и регистра) или число с допуском"""
+
+    def __init__(self, answer, tolerance=DEFAULT_TOLERANCE):
+        self.tolerance = tolerance
+        self.options = [normalize_text(opt) for opt in split_options(answer)]
+        self.numbers = [num for num in map(to_number, self.options) if num is not None]
+
+    def normalize(self, user_answer):
+        return normalize_text(user_answer)
+
+    def match(self, normalized):
+        if normalized in self.options:
+            return True
+        user_num = to_number(normalized)
+        if user_num is None:
+            return False
+        return any(abs(user_num - num) <= self.tolerance for num in self.numbers)
+
+class ListMatcher:
+    """Список элементов с учетом (ordered) или без учета (unordered) порядка"""
+
+    def __init__(self, answer, ordered=True, tolerance=DEFAULT_TOLERANCE):
+        self.ordered = ordered
+        self.tolerance = tolerance
+        self.options = [self._canonical(split_items(opt)) for opt in split_options(answer)]
+
+    def _canonical(self, items):
+        return items if self.ordered else tuple(sorted(items))
+
+    def normalize(self, user_answer):
+        return self._canonical(split_items(user_answer))
+
+    def _item_matches(self, user_item, item):
+        if user_item == item:
+            return True
+        user_num, num = to_number(user_item), to_number(item)
+        return user_num is not None and num is not None and abs(user_num - num) <= self.tolerance
+
+    def match(self, normalized):
+        for option in self.options:
+            if len(option) == len(normalized) and all(map(self._item_matches, normalized, option)):
+                return True
+        return False
+
+class RangeMatcher:
+    """Число в одном из диапазонов вида «min..max»"""
+
+    def __init__(self, answer, tolerance=0):
+        self.ranges = []
+        for opt in split_options(answer):
+            low, sep, high = opt.partition('..')
+            low, high = to_number(low.strip()), to_number(high.strip())
+            if not sep or low is None or high is None:
+                raise ValueError(f"Некорректный диапазон: {opt}")
+            self.ranges.append((min(low, high) - tolerance, max(low, high) + tolerance))
+
+    def normalize(self, user_answer):
+        return to_number(normalize_text(user_answer))
+
+    def match(self, normalized):
+        return normalized is not None and any(low <= normalized <= high for low, high in self.ranges)
+
+class RegexMatcher:
+    """Регулярное выражение на весь ответ (пробелы схлопываются, регистр не важен)"""
+
+    def __init__(self, answer):
+        try:
+            self.pattern = re.compile(answer.strip(), re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"Некорректное регулярное выражение: {e}")
+
+    def normalize(self, user_answer):
+        return ' '.join(user_answer.split()).lower()
+
+    def match(self, normalized):
+        return self.pattern.fullmatch(normalized) is not None
+
+class FuzzyMatcher:
+    """Текст с опечатками: не больше max_distance правок (вставка, удаление, замена)"""
+
+    def __init__(self, answer, max_distance=None):
+        self.options = [normalize_text(opt) for opt in split_options(answer)]
+        self.max_distance = max_distance
+
+    def normalize(self, user_answer):
+        return normalize_text(user_answer)
+
+    def _limit(self, option):
+        if self.max_distance is not None:
+            return self.max_distance
+        return max(1, len(option) // 10)
+
+    def match(self, normalized):
+        for option in self.options:
+            limit = self._limit(option)
+            if bounded_levenshtein(normalized, option, limit) <= limit:
+                return True
+        return False
+
+def compile_matcher(question):
+    """Собирает объект проверки ответа по полям вопроса (type, tolerance, max_distance)"""
+    answer = question['answer']
+    answer_type = question.get('type', 'text')
+    tolerance = question.get('tolerance')
+    tolerance = float(tolerance.replace(',', '.')) if tolerance else None
+    max_distance = question.get('max_distance')
+    max_distance = int(max_distance) if max_distance else None
+
+    if answer_type == 'text':
+        return TextMatcher(answer, DEFAULT_TOLERANCE if tolerance is None else tolerance)
+    if answer_type in ('ordered', 'unordered'):
+        return ListMatcher(answer, answer_type == 'ordered', DEFAULT_TOLERANCE if tolerance is None else tolerance)
+    if answer_type == 'range':
+        return RangeMatcher(answer, tolerance or 0)
+    if answer_type == 'regex':
+        return RegexMatcher(answer)
+    if answer_type == 'fuzzy':
+        return FuzzyMatcher(answer, max_distance)
+    raise ValueError(f"Неизвестный тип ответа: {answer_type}")
+
+def check_answer(user_answer, correct_answer, answer_type='text'):
+    """Проверяет правильность ответа без кэша"""
+    if len(user_answer) > MAX_ANSWER_LENGTH:
+        return False
+    matcher = compile_matcher({'answer': correct_answer, 'type': answer_type})
+    return matcher.match(matcher.normalize(user_answer))
+
+class QuestionBank(namedtuple('QuestionBank', ['questions', 'matchers', 'max_score', 'version', 'positions'])):
+    """Неизменяемый снимок набора вопросов: все поля меняются одним присваиванием.
+
+    positions — {id вопроса: место в questions}. Искать вопрос нужно по id:
+    после пропущенного блока id и место в списке расходятся.
+    """
+
+    __slots__ = ()
+
+    def position(self, question_id):
+        """Место вопроса с этим id в questions или None"""
+        if not isinstance(question_id, int):
+            return None
+        return self.positions.get(question_id)
+
+class QuestionSet:
+    """Набор вопросов из файла с версией и отслеживанием изменений.
+
+    Актуальный набор лежит в ``current`` (``QuestionBank``) и подменяется
+    целиком, поэтому читатель, взявший ``current`` один раз, всегда видит
+    согласованные вопросы, проверки и версию.
+    """
+
+    def __init__(self, filename, check_interval=5.0):
+        self.filename = filename
+        self.check_interval = check_interval
+        self.current = QuestionBank((), (), 0, None, {})
+        self._mtime = None
+        self._next_check = 0
+        self._lock = threading.Lock()
+        self.reload()
+
+    @property
+    def questions(self):
+        return self.current.questions
+
+    @property
+    def matchers(self):
+        return self.current.matchers
+
+    @property
+    def max_score(self):
+        return self.current.max_score
+
+    @property
+    def version(self):
+        return self.current.version
+
+    def _stat_mtime(self):
+        try:
+            return os.stat(self.filename).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self):
+        """Перечитывает файл вопросов"""
+        mtime = self._stat_mtime()
+        content = b''
+        if mtime is not None:
+            with open(self.filename, 'rb') as f:
+                content = f.read()
+
+        parsed = parse_questions_with_matchers(content.decode('utf-8'))
+        questions = tuple(q for q, _ in parsed)
+        self.current = QuestionBank(
+            questions=questions,
+            matchers=tuple(matcher for _, matcher in parsed),
+            max_score=sum(q['score'] for q in questions),
+            version=hashlib.sha1(content).hexdigest()[:12],
+            positions={q['id']: position for position, q in enumerate(questions)},
+        )
+        self._mtime = mtime
+
+    def refresh(self):
+        """Перечитывает файл, если он изменился. Проверка — не чаще check_interval секунд.
+
+        При check_interval=None файл читается только при создании набора.
+        """
+        if self.check_interval is None:
+            return False
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        with self._lock:
+            if now < self._next_check:
+                return False
+            self._next_check = now + self.check_interval
+            if self._stat_mtime() == self._mtime:
+                return False
+            old_version = self.version
+            self.reload()
+            return self.version != old_version
+
+class AnswerCache:
+    """Ограниченный LRU-кэш результатов проверки со счетчиками попаданий"""
+
+    def __init__(self, maxsize=8192):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0
+        }
+
+class Grader:
+    """Проверка ответов на вопросы QuestionSet через AnswerCache"""
+
+    def __init__(self, question_set, cache=None):
+        self.question_set = question_set
+        self.cache = cache if cache is not None else AnswerCache()
+
+    @property
+    def questions(self):
+        return self.question_set.questions
+
+    def refresh(self):
+        """Подхватывает изменения questions.txt, сбрасывает кэш и возвращает текущий QuestionBank"""
+        if self.question_set.refresh():
+            self.cache.clear()
+        return self.question_set.current
+
+    def grade(self, question_id, user_answer, bank=None):
+        """Проверяет ответ на вопрос с id question_id. Слишком длинный ответ неверен.
+
+        bank — снимок, из которого вызывающий взял вопрос; иначе текущий.
+        """
+        if len(user_answer) > MAX_ANSWER_LENGTH:
+            return False
+        if bank is None:
+            bank = self.question_set.current
+        position = bank.position(question_id)
+        if position is None:
+            return False
+        matcher = bank.matchers[position]
+        normalized = matcher.normalize(user_answer)
+        key = (question_id, normalized, bank.version)
+        return self.cache.get_or_compute(key, lambda: matcher.match(normalized))
@@ -0,0 +1,160 @@
+"""Отсортированный файловый индекс ID участников.
+
+Файл состоит из строк одинаковой длины (ID, дополненный пробелами справа),
+отсортированных по возрастанию. Поиск — бинарный по mmap, поэтому ни время
+проверки, ни память не растут с числом ID. Индекс пересобирается внешней
+сортировкой: новые ID режутся на отсортированные куски во временных файлах
+и сливаются с существующим индексом через ``heapq.merge``.
+"""
+import heapq
+import logging
+import mmap
+import os
+import tempfile
+
+CHUNK_SIZE = 100000
+
+logger = logging.getLogger(__name__)
+
+
+class SortedIdIndex:
+    """Бинарный поиск по отсортированному файлу фиксированной ширины"""
+
+    def __init__(self, path):
+        self.path = path
+        self._mmap = None
+        self._mtime = None
+        self.width = 0
+        self.count = 0
+
+    def _open(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if self._mmap is not None and mtime == self._mtime:
+            return
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+        with open(self.path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mtime = mtime
+        if self._mmap is None:
+            self.width = self.count = 0
+            return
+        record = self._mmap.find(b'\n') + 1
+        self.width = record - 1
+        self.count = size // record
+
+    def __contains__(self, user_id):
+        if not os.path.exists(self.path):
+            return False
+        self._open()
+        key = user_id.encode('utf-8')
+        if not self.count or len(key) > self.width:
+            return False
+        key = key.ljust(self.width)
+        record = self.width + 1
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = self._mmap[mid * record:mid * record + self.width]
+            if value < key:
+                lo = mid + 1
+            elif value > key:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+            self._mtime = None
+
+    def __len__(self):
+        if not os.path.exists(self.path):
+            return 0
+        self._open()
+        return self.count
+
+    def __iter__(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield line.rstrip()
+
+
+def _spill(chunk, tmpdir):
+    chunk.sort()
+    fd, path = tempfile.mkstemp(dir=tmpdir, suffix='.ids')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        for user_id in chunk:
+            f.write(user_id + '\n')
+    return path
+
+
+def _read_sorted(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield line.rstrip('\n')
+
+
+def merge_into_index(existing, new_ids, chunk_size=CHUNK_SIZE, replace=False):
+    """Добавляет ID в индекс SortedIdIndex (внешняя сортировка + слияние).
+
+    С ``replace=True`` индекс собирается заново только из new_ids. Возвращает
+    число новых ID. Пока идет чтение new_ids, индексом можно пользоваться для
+    поиска: файл подменяется только в самом конце.
+    """
+    index_path = existing.path
+    existing_count = 0 if replace else len(existing)
+    width = 0 if replace else existing.width
+    tmpdir = os.path.dirname(os.path.abspath(index_path))
+    chunks = []
+    chunk = []
+    try:
+        for user_id in new_ids:
+            user_id = user_id.strip()
+            if not user_id:
+                continue
+            if min(user_id) < ' ':
+                logger.warning("ID с управляющими символами пропущен: %r", user_id)
+                continue
+            width = max(width, len(user_id.encode('utf-8')))
+            chunk.append(user_id)
+            if len(chunk) >= chunk_size:
+                chunks.append(_spill(chunk, tmpdir))
+                chunk = []
+        if chunk:
+            chunks.append(_spill(chunk, tmpdir))
+
+        # В ID нет символов меньше пробела и пробелов по краям: порядок строк
+        # совпадает с порядком байтов, дополненных пробелами до общей ширины,
+        # — как в __contains__
+        sources = [_read_sorted(path) for path in chunks]
+        if existing_count:
+            sources.append(iter(existing))
+
+        fd, tmp_path = tempfile.mkstemp(dir=tmpdir, suffix='.idx')
+        written = 0
+        previous = None
+        with os.fdopen(fd, 'wb') as out:
+            for user_id in heapq.merge(*sources):
+                if user_id == previous:
+                    continue
+                previous = user_id
+                out.write(user_id.encode('utf-8').ljust(width) + b'\n')
+                written += 1
+            out.flush()
+            os.fsync(out.fileno())
+        # На Windows файл с открытым mmap нельзя заменить
+        existing.close()
+        os.replace(tmp_path, index_path)
+        return written - existing_count
+    finally:
+        for path in chunks:
+            os.remove(path)
@@ -0,0 +1,305 @@
+"""Фоновые задачи админки: статистика, экспорт и перепроверка результатов.
+
+Тяжелые задачи не выполняются в потоке запроса. ``JobManager`` ставит их в
+очередь; отдельный поток-диспетчер делит результаты на куски примерно по
+``chunk_size`` (``Storage.result_chunks``: диапазоны байтов results.csv или
+id в SQLite) и раздает описания кусков пулу процессов. Каждый процесс сам
+читает и разбирает свой кусок, так что работа распределяется по ядрам и не
+мешает обработке запросов участников. Состояние задачи опрашивается через
+``JobManager.get``.
+
+Функции ``*_chunk`` выполняются в дочерних процессах, поэтому они не
+трогают ни Flask, ни объект хранилища — только переданные им данные.
+"""
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from atomic_io import AtomicWriter, write_json_array
+from grading import MAX_ANSWER_LENGTH, compile_matcher
+from storage import RESULTS_CSV_HEADER, read_result_chunk, result_to_csv_row
+
+DEFAULT_CHUNK_SIZE = 2000
+MAX_JOBS = 50
+SCORE_BUCKETS = 10
+RECENT_RESULTS = 100
+RECENT_FIELDS = ('timestamp', 'user_id', 'score', 'max_score', 'percent')
+
+logger = logging.getLogger(__name__)
+
+
+# --- Работа над одним куском результатов (в дочернем процессе) ---
+
+def stats_chunk(results):
+    """Частичные суммы для статистики по куску результатов"""
+    partial = {
+        'count': 0,
+        'score_sum': 0,
+        'percent_sum': 0.0,
+        'time_sum': 0,
+        'histogram': [0] * SCORE_BUCKETS,
+        'questions': {},
+        'recent': [{key: result.get(key) for key in RECENT_FIELDS} for result in results[-RECENT_RESULTS:]],
+    }
+    for result in results:
+        partial['count'] += 1
+        partial['score_sum'] += result['score']
+        partial['percent_sum'] += result['percent']
+        partial['time_sum'] += result.get('time_seconds', 0)
+        bucket = min(int(result['percent'] // (100 / SCORE_BUCKETS)), SCORE_BUCKETS - 1)
+        partial['histogram'][bucket] += 1
+        for detail in result.get('details', []):
+            answered, correct = partial['questions'].get(detail['question_id'], (0, 0))
+            partial['questions'][detail['question_id']] = (answered + 1, correct + bool(detail['correct']))
+    return partial
+
+
+def export_chunk(results):
+    """Кусок results.csv (без заголовка)"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(result_to_csv_row(result) for result in results)
+    return buffer.getvalue()
+
+
+_matchers_cache = {}
+
+
+def regrade_chunk(results, questions, version):
+    """Перепроверяет ответы куска по текущим вопросам (ответы привязаны к id вопроса)"""
+    by_id = _matchers_cache.get(version)
+    if by_id is None:
+        _matchers_cache.clear()
+        by_id = _matchers_cache[version] = {q['id']: (q, compile_matcher(q)) for q in questions}
+    max_score = sum(q['score'] for q in questions)
+
+    regraded = []
+    for result in results:
+        details = []
+        total_score = 0
+        for detail in result.get('details', []):
+            question_id = detail['question_id']
+            if question_id not in by_id:
+                continue
+            question, matcher = by_id[question_id]
+            user_answer = str(detail['user_answer'])
+            is_correct = (len(user_answer) <= MAX_ANSWER_LENGTH
+                          and matcher.match(matcher.normalize(user_answer)))
+            score = question['score'] if is_correct else 0
+            total_score += score
+            details.append(dict(detail, correct=is_correct, score=score))
+        percent = (total_score / max_score * 100) if max_score > 0 else 0
+        regraded.append(dict(result, score=total_score, max_score=max_score,
+                             percent=round(percent, 1), details=details,
+                             previous_score=result['score']))
+    return regraded
+
+
+def run_chunk(func, source, *args):
+    """Читает кусок по описанию и обрабатывает его. Возвращает (размер куска, итог)"""
+    results = read_result_chunk(source)
+    return len(results), func(results, *args)
+
+
+# --- Сборка результатов кусков (в потоке-диспетчере) ---
+
+def merge_stats(partials):
+    total = {'count': 0, 'score_sum': 0, 'percent_sum': 0.0, 'time_sum': 0,
+             'histogram': [0] * SCORE_BUCKETS, 'questions': {}, 'recent': deque(maxlen=RECENT_RESULTS)}
+    for partial in partials:
+        total['recent'].extend(partial['recent'])
+        for key in ('count', 'score_sum', 'percent_sum', 'time_sum'):
+            total[key] += partial[key]
+        total['histogram'] = [a + b for a, b in zip(total['histogram'], partial['histogram'])]
+        for question_id, (answered, correct) in partial['questions'].items():
+            old_answered, old_correct = total['questions'].get(question_id, (0, 0))
+            total['questions'][question_id] = (old_answered + answered, old_correct + correct)
+
+    count = total['count']
+    return {
+        'total_users': count,
+        'average_score': round(total['score_sum'] / count, 1) if count else 0,
+        'average_percent': round(total['percent_sum'] / count, 1) if count else 0,
+        'average_time_seconds': round(total['time_sum'] / count) if count else 0,
+        'percent_histogram': total['histogram'],
+        'questions': [
+            {'question_id': question_id, 'answered': answered, 'correct': correct,
+             'correct_percent': round(correct / answered * 100, 1) if answered else 0}
+            for question_id, (answered, correct) in sorted(total['questions'].items())
+        ],
+        'recent_results': list(total['recent']),
+    }
+
+
+class Job:
+    """Состояние одной фоновой задачи"""
+
+    def __init__(self, kind, params):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.status = 'queued'
+        self.created = datetime.now().isoformat()
+        self.started = None
+        self.finished = None
+        self.processed = 0
+        self.chunks = 0
+        self.result = None
+        self.error = None
+        self.file = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.kind,
+            'status': self.status,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'processed': self.processed,
+            'chunks': self.chunks,
+            'result': self.result,
+            'error': self.error,
+            'download': bool(self.file),
+        }
+
+
+class JobManager:
+    """Очередь задач и пул процессов для них"""
+
+    KINDS = ('stats', 'export', 'regrade')
+
+    def __init__(self, storage, question_set, jobs_dir='jobs', max_workers=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        self.storage = storage
+        self.question_set = question_set
+        self.jobs_dir = jobs_dir
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.chunk_size = chunk_size
+        self.writer = AtomicWriter()
+        self._jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._thread = None
+
+    def submit(self, kind, params=None):
+        if kind not in self.KINDS:
+            raise ValueError(f"Неизвестный тип задачи: {kind}")
+        job = Job(kind, params or {})
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict_old_jobs()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch_loop, name='job-dispatcher', daemon=True)
+                self._thread.start()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def list(self):
+        return [job.to_dict() for job in reversed(list(self._jobs.values()))]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _evict_old_jobs(self):
+        finished = [job for job in self._jobs.values() if job.status in ('done', 'failed')]
+        for job in finished[:max(0, len(self._jobs) - MAX_JOBS)]:
+            del self._jobs[job.id]
+            if job.file and os.path.exists(job.file):
+                os.remove(job.file)
+
+    def _get_pool(self):
+        # spawn: дочерние процессы не наследуют потоки и сокеты веб-сервера
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def _map_chunks(self, job, func, *args):
+        """Раздает куски пулу и отдает их результаты по порядку.
+
+        В работе одновременно не больше 2 * max_workers кусков, так что память
+        ограничена при любом размере results.
+        """
+        pool = self._get_pool()
+        pending = deque()
+        for source in self.storage.result_chunks(self.chunk_size):
+            pending.append(pool.submit(run_chunk, func, source, *args))
+            job.chunks += 1
+            if len(pending) >= 2 * self.max_workers:
+                size, value = pending.popleft().result()
+                job.processed += size
+                yield value
+        while pending:
+            size, value = pending.popleft().result()
+            job.processed += size
+            yield value
+
+    def _dispatch_loop(self):
+        while True:
+            job = self._queue.get()
+            job.status = 'running'
+            job.started = datetime.now().isoformat()
+            started = time.monotonic()
+            try:
+                getattr(self, f"_run_{job.kind}")(job)
+                job.status = 'done'
+            except Exception as e:
+                logger.exception("Задача %s (%s) упала", job.id, job.kind)
+                job.status = 'failed'
+                job.error = str(e)
+            job.finished = datetime.now().isoformat()
+            if isinstance(job.result, dict):
+                job.result['seconds'] = round(time.monotonic() - started, 3)
+
+    def _job_file(self, job, extension):
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        return os.path.join(self.jobs_dir, f"{job.kind}_{job.id}.{extension}")
+
+    def _run_stats(self, job):
+        job.result = merge_stats(self._map_chunks(job, stats_chunk))
+
+    def _run_export(self, job):
+        path = self._job_file(job, 'csv')
+
+        def write(f):
+            csv.writer(f).writerow(RESULTS_CSV_HEADER)
+            for text in self._map_chunks(job, export_chunk):
+                f.write(text)
+
+        self.writer.write(path, write, durable=True, encoding='utf-8-sig', newline='')
+        job.file = path
+        job.result = {'rows': job.processed}
+
+    def _run_regrade(self, job):
+        question_set = self.question_set
+        question_set.refresh()
+        bank = question_set.current
+        path = self._job_file(job, 'json')
+        summary = {'changed': 0, 'score_before': 0, 'score_after': 0}
+
+        def regraded():
+            for chunk in self._map_chunks(job, regrade_chunk, bank.questions, bank.version):
+                for result in chunk:
+                    summary['score_before'] += result['previous_score']
+                    summary['score_after'] += result['score']
+                    summary['changed'] += result['score'] != result['previous_score']
+                    yield result
+
+        self.writer.write(path, lambda f: write_json_array(f, regraded()), durable=True)
+        job.file = path
+        summary['questions_version'] = bank.version
+        job.result = summary
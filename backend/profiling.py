@@ -0,0 +1,141 @@
+"""Выборочное профилирование запросов в продакшене.
+
+Профилируется случайная доля запросов (``sample_rate``). Пока такой запрос
+выполняется, фоновый поток раз в ``interval`` секунд снимает стек его
+потока через ``sys._current_frames()``. Стеки копятся по маршрутам в
+формате collapsed stacks (``маршрут;модуль:функция;... число``), который
+понимают flamegraph.pl и speedscope.
+
+Когда профилирование выключено, на запрос приходится одна проверка флага,
+а фоновый поток не работает.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import request
+
+DEFAULT_INTERVAL = 0.005
+MAX_STACKS = 20000
+MAX_DEPTH = 128
+OTHER_STACK = '[прочее]'
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', os.path.basename(code.co_filename))
+    return f"{module}:{code.co_name}"
+
+
+class RequestProfiler:
+    """Сэмплирующий профилировщик Flask-запросов с агрегацией по маршрутам"""
+
+    def __init__(self, sample_rate=0.0, interval=DEFAULT_INTERVAL, max_stacks=MAX_STACKS):
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.enabled = sample_rate > 0
+        self._active = {}
+        self._stacks = Counter()
+        self._requests = Counter()
+        self._samples = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls):
+        """Создает профилировщик из PROFILE_SAMPLE_RATE и PROFILE_INTERVAL_MS"""
+        return cls(sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+                   interval=float(os.environ.get('PROFILE_INTERVAL_MS', DEFAULT_INTERVAL * 1000)) / 1000)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    def configure(self, enabled=None, sample_rate=None, interval=None):
+        """Включает/выключает профилирование и меняет параметры на лету"""
+        if sample_rate is not None:
+            self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+        if interval is not None:
+            self.interval = max(float(interval), 0.001)
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if self.enabled and self.sample_rate == 0:
+            self.sample_rate = 1.0
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self._requests.clear()
+            self._samples.clear()
+
+    def _before_request(self):
+        if not self.enabled or random.random() >= self.sample_rate:
+            return
+        route = request.url_rule.rule if request.url_rule else request.path
+        route = f"{request.method} {route}"
+        self._active[threading.get_ident()] = route
+        with self._lock:
+            self._requests[route] += 1
+        self._ensure_sampler()
+
+    def _teardown_request(self, exc=None):
+        if self._active:
+            self._active.pop(threading.get_ident(), None)
+
+    def _ensure_sampler(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._sample_loop, name='request-profiler', daemon=True)
+            self._thread.start()
+
+    def _sample_loop(self):
+        while self.enabled:
+            time.sleep(self.interval)
+            if self._active:
+                self._sample()
+
+    def _sample(self):
+        frames = sys._current_frames()
+        for thread_id, route in list(self._active.items()):
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None and len(names) < MAX_DEPTH:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            names.append(route)
+            stack = ';'.join(reversed(names))
+
+            with self._lock:
+                if stack not in self._stacks and len(self._stacks) >= self.max_stacks:
+                    stack = f"{route};{OTHER_STACK}"
+                self._stacks[stack] += 1
+                self._samples[route] += 1
+
+    def collapsed(self, route=None):
+        """Дамп в формате collapsed stacks, опционально только для одного маршрута"""
+        with self._lock:
+            items = sorted(self._stacks.items())
+        prefix = f"{route};" if route else ''
+        return ''.join(f"{stack} {count}\n" for stack, count in items if stack.startswith(prefix))
+
+    def stats(self):
+        with self._lock:
+            routes = {route: {'requests': self._requests[route], 'samples': self._samples[route]}
+                      for route in self._requests}
+            stacks = len(self._stacks)
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'interval_ms': round(self.interval * 1000, 3),
+            'unique_stacks': stacks,
+            'routes': routes
+        }
@@ -0,0 +1,218 @@
+"""
+Массовая выдача ID участникам.
+
+Примеры:
+    # 20 000 новых ID без списка участников
+    python provision_ids.py generate 20000 --out credentials.csv
+
+    # ID для каждого участника из списка (CSV с любыми колонками: ФИО, класс, школа...)
+    python provision_ids.py import roster.csv --out credentials.csv
+
+    # Печатные карточки с ID
+    python provision_ids.py sheets credentials.csv --out sheets.html
+
+Новые ID сразу записываются в хранилище, выбранное через STORAGE_BACKEND
+(или --backend). Для файлового хранилища строится отсортированный индекс
+valid_ids.idx, по которому сервер ищет ID бинарным поиском. Все шаги
+работают потоково: список участников и карточки не загружаются в память целиком.
+"""
+import argparse
+import csv
+import hashlib
+import hmac
+import html
+import secrets
+import sys
+
+from storage import create_storage
+
+DEFAULT_LENGTH = 6
+FEISTEL_ROUNDS = 4
+
+
+class IdGenerator:
+    """Генератор неповторяющихся числовых ID заданной длины.
+
+    Номера 0, 1, 2, ... пропускаются через секретную перестановку (сеть
+    Фейстеля с «прогулкой по циклу»), поэтому ID не повторяются, не идут
+    подряд и не требуют хранить уже выданные в памяти. ID, которые уже
+    есть в хранилище, пропускаются.
+    """
+
+    def __init__(self, length=DEFAULT_LENGTH, exists=None, key=None):
+        if length < 4:
+            raise ValueError("Длина ID должна быть не меньше 4 цифр")
+        self.low = 10 ** (length - 1)
+        self.size = 9 * self.low
+        self.exists = exists or (lambda user_id: False)
+        self.key = key or secrets.token_bytes(16)
+        self.half_bits = (self.size.bit_length() + 1) // 2
+        self.half_mask = (1 << self.half_bits) - 1
+        self.counter = 0
+
+    def _round(self, value, round_index):
+        digest = hmac.new(self.key, f"{round_index}:{value}".encode(), hashlib.sha256).digest()
+        return int.from_bytes(digest[:8], 'big') & self.half_mask
+
+    def _permute(self, value):
+        while True:
+            left, right = value >> self.half_bits, value & self.half_mask
+            for round_index in range(FEISTEL_ROUNDS):
+                left, right = right, left ^ self._round(right, round_index)
+            value = (left << self.half_bits) | right
+            if value < self.size:
+                return value
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while self.counter < self.size:
+            user_id = str(self.low + self._permute(self.counter))
+            self.counter += 1
+            if not self.exists(user_id):
+                return user_id
+        raise RuntimeError("Свободные ID этой длины закончились, увеличьте --length")
+
+
+def open_roster(filename):
+    """Открывает CSV со списком участников, определяя разделитель"""
+    f = open(filename, 'r', encoding='utf-8-sig', newline='')
+    sample = f.read(4096)
+    f.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    return f, csv.reader(f, dialect)
+
+
+def provision(storage, rows, header, out_filename, length):
+    """Выдает ID каждой строке rows, пишет credentials CSV и сохраняет ID в хранилище"""
+    generator = IdGenerator(length, exists=storage.is_valid_id)
+    count = 0
+
+    with open(out_filename, 'w', encoding='utf-8-sig', newline='') as out:
+        writer = csv.writer(out)
+        writer.writerow(header + ['ID'])
+
+        def issued_ids():
+            nonlocal count
+            for row in rows:
+                user_id = next(generator)
+                writer.writerow(row + [user_id])
+                count += 1
+                yield user_id
+
+        storage.add_valid_ids(issued_ids())
+
+    storage.close()
+    return count
+
+
+def cmd_generate(args):
+    storage = create_storage(args.backend)
+    rows = ([str(i + 1)] for i in range(args.count))
+    count = provision(storage, rows, ['№'], args.out, args.length)
+    print(f"Выдано ID: {count}. Список: {args.out}")
+
+
+def cmd_import(args):
+    storage = create_storage(args.backend)
+    f, reader = open_roster(args.roster)
+    with f:
+        header = next(reader, None)
+        if header is None:
+            print("Список участников пуст")
+            return
+        rows = (row for row in reader if any(cell.strip() for cell in row))
+        count = provision(storage, rows, header, args.out, args.length)
+    print(f"Выдано ID: {count}. Список: {args.out}")
+
+
+SHEET_HEAD = """<!DOCTYPE html>
+<html lang="ru">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+    body {{ font-family: Arial, sans-serif; margin: 0; }}
+    .sheet {{ display: flex; flex-wrap: wrap; }}
+    .card {{ box-sizing: border-box; width: 50%; height: 6.5cm; padding: 0.6cm;
+             border: 1px dashed #999; page-break-inside: avoid; }}
+    .card h2 {{ margin: 0 0 0.3cm; font-size: 16px; }}
+    .field {{ font-size: 13px; margin: 2px 0; }}
+    .id {{ font-size: 32px; font-weight: bold; letter-spacing: 4px; margin-top: 0.4cm; }}
+    .url {{ font-size: 12px; color: #555; margin-top: 0.2cm; }}
+</style>
+</head>
+<body>
+<div class="sheet">
+"""
+
+SHEET_TAIL = """</div>
+</body>
+</html>
+"""
+
+
+def cmd_sheets(args):
+    title = html.escape(args.title)
+    url = html.escape(args.url) if args.url else ''
+    count = 0
+
+    with open(args.credentials, 'r', encoding='utf-8-sig', newline='') as f, \
+            open(args.out, 'w', encoding='utf-8') as out:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header or header[-1] != 'ID':
+            print("Ожидается CSV от команд generate/import (последняя колонка — ID)")
+            sys.exit(1)
+
+        out.write(SHEET_HEAD.format(title=title))
+        for row in reader:
+            if not row:
+                continue
+            fields = ''.join(
+                f'<div class="field">{html.escape(name)}: {html.escape(value)}</div>'
+                for name, value in zip(header[:-1], row[:-1]) if name != '№'
+            )
+            out.write(f'<div class="card"><h2>{title}</h2>{fields}'
+                      f'<div class="id">{html.escape(row[-1])}</div>'
+                      + (f'<div class="url">{url}</div>' if url else '') + '</div>\n')
+            count += 1
+        out.write(SHEET_TAIL)
+
+    print(f"Карточек: {count}. Файл для печати: {args.out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Массовая выдача ID участникам")
+    parser.add_argument('--backend', help="file, sqlite или memory (по умолчанию STORAGE_BACKEND)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate = subparsers.add_parser('generate', help="сгенерировать N новых ID")
+    generate.add_argument('count', type=int)
+    generate.add_argument('--out', default='credentials.csv')
+    generate.add_argument('--length', type=int, default=DEFAULT_LENGTH)
+    generate.set_defaults(func=cmd_generate)
+
+    import_ = subparsers.add_parser('import', help="выдать ID участникам из CSV")
+    import_.add_argument('roster')
+    import_.add_argument('--out', default='credentials.csv')
+    import_.add_argument('--length', type=int, default=DEFAULT_LENGTH)
+    import_.set_defaults(func=cmd_import)
+
+    sheets = subparsers.add_parser('sheets', help="карточки с ID для печати")
+    sheets.add_argument('credentials')
+    sheets.add_argument('--out', default='sheets.html')
+    sheets.add_argument('--title', default='IT Спринт')
+    sheets.add_argument('--url', default='')
+    sheets.set_defaults(func=cmd_sheets)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
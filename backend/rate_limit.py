@@ -0,0 +1,127 @@
+"""Ограничение частоты запросов: token bucket по user_id и по IP клиента.
+
+Для каждого маршрута задаются два ведра: на участника (``user``, ключ —
+``user_id`` из тела запроса) и на IP-адрес (``ip``). Запрос проходит, только
+если токен есть в обоих; запрос без ``user_id`` проверяется только по IP.
+IP-лимит делается щедрым — весь класс школы обычно выходит в интернет
+с одного адреса. Отклонённые запросы получают 429 и ``Retry-After``.
+
+Состояние ведра — кортеж ``(токены, время)`` в ``OrderedDict``; при
+превышении ``max_keys`` вытесняются самые давно не использованные ключи,
+так что память ограничена при любом числе клиентов.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import jsonify, request
+
+# rate — токенов в секунду, burst — размер ведра
+DEFAULT_LIMITS = {
+    'validate_id': {'user': (0.2, 5), 'ip': (5, 60)},
+    # user_id в /api/check-answer необязателен, поэтому IP-лимит здесь строже
+    'check_answer': {'user': (2, 20), 'ip': (10, 100)},
+    # Фронтенд сохраняет прогресс на каждый тик таймера (раз в секунду) и на
+    # каждое нажатие клавиши: при наборе текста это до ~10 запросов в секунду
+    'save_progress': {'user': (5, 50), 'ip': (200, 2000)},
+}
+
+MAX_KEYS = 20000
+
+
+class TokenBucket:
+    """Набор token bucket'ов с одинаковыми параметрами и LRU-вытеснением"""
+
+    def __init__(self, rate, burst, max_keys=MAX_KEYS):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, now=None):
+        """Забирает токен. Возвращает (разрешено, через сколько секунд повторить)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            state = self._buckets.get(key)
+            if state is None:
+                tokens = self.burst
+                if len(self._buckets) >= self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                tokens, last = state
+                tokens = min(self.burst, tokens + (now - last) * self.rate)
+                self._buckets.move_to_end(key)
+
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return True, 0
+
+            self._buckets[key] = (tokens, now)
+            return False, (1 - tokens) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class RateLimiter:
+    """Лимиты по маршрутам. Подключается к view через декоратор ``limit``"""
+
+    def __init__(self, limits=None, enabled=True, max_keys=MAX_KEYS):
+        self.enabled = enabled
+        self.buckets = {}
+        for route, scopes in (limits or DEFAULT_LIMITS).items():
+            self.buckets[route] = {scope: TokenBucket(rate, burst, max_keys)
+                                   for scope, (rate, burst) in scopes.items()}
+
+    @classmethod
+    def from_env(cls):
+        """Создает лимитер из RATE_LIMIT_ENABLED и RATE_LIMITS (JSON поверх DEFAULT_LIMITS)"""
+        limits = {route: dict(scopes) for route, scopes in DEFAULT_LIMITS.items()}
+        overrides = json.loads(os.environ.get('RATE_LIMITS', '{}'))
+        for route, scopes in overrides.items():
+            limits.setdefault(route, {}).update({scope: tuple(value) for scope, value in scopes.items()})
+        enabled = os.environ.get('RATE_LIMIT_ENABLED', '1') not in ('0', 'false', 'no')
+        return cls(limits, enabled=enabled, max_keys=int(os.environ.get('RATE_LIMIT_MAX_KEYS', MAX_KEYS)))
+
+    def check(self, route, user_id=None, ip=None):
+        """Проверяет запрос. Возвращает (разрешено, Retry-After в секундах)"""
+        scopes = self.buckets.get(route)
+        if not self.enabled or not scopes:
+            return True, 0
+
+        # Отказ по первому ведру не тратит токен второго
+        for scope, key in (('user', user_id), ('ip', ip)):
+            bucket = scopes.get(scope)
+            if bucket is None or not key:
+                continue
+            allowed, wait = bucket.consume(key)
+            if not allowed:
+                return False, wait
+        return True, 0
+
+    def limit(self, route):
+        """Декоратор Flask view: отвечает 429, если лимит маршрута исчерпан"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                data = request.get_json(silent=True) or {}
+                user_id = data.get('user_id') if isinstance(data, dict) else None
+                if isinstance(user_id, str):
+                    user_id = user_id.strip()
+                else:
+                    user_id = None
+
+                allowed, retry_after = self.check(route, user_id, request.remote_addr)
+                if not allowed:
+                    response = jsonify({'error': 'Слишком много запросов. Попробуйте чуть позже.'})
+                    response.status_code = 429
+                    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+                    return response
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
@@ -0,0 +1,74 @@
+"""
+Восстановление results.json после сбоя.
+
+results.csv пишется только дописыванием, поэтому он — источник истины.
+Скрипт потоково читает его, заново собирает results.json (атомарно),
+дописывает недостающие ID в used_ids.txt и печатает итоговую статистику.
+Недописанные при падении строки CSV пропускаются.
+
+Запуск (из папки backend):
+    python recover_results.py
+    python recover_results.py --csv results.csv --json results.json --used-ids used_ids.txt
+"""
+import argparse
+import os
+
+from atomic_io import AtomicWriter, write_json_array
+from storage import iter_results_csv, read_ids_file, USED_IDS_HEADER
+
+
+def recover(csv_path, json_path, used_ids_path):
+    """Пересобирает results.json и used_ids.txt из results.csv. Возвращает статистику"""
+    errors = []
+    stats = {'total_users': 0, 'score_sum': 0, 'percent_sum': 0.0}
+    completed_ids = []
+
+    def results():
+        for result in iter_results_csv(csv_path, errors):
+            stats['total_users'] += 1
+            stats['score_sum'] += result['score']
+            stats['percent_sum'] += result['percent']
+            completed_ids.append(result['user_id'])
+            yield result
+
+    writer = AtomicWriter()
+    writer.write(json_path, lambda f: write_json_array(f, results()), durable=True)
+
+    if used_ids_path:
+        used_ids = read_ids_file(used_ids_path)
+        missing = list(dict.fromkeys(user_id for user_id in completed_ids if user_id not in used_ids))
+        if missing:
+            if not os.path.exists(used_ids_path):
+                writer.write_text(used_ids_path, USED_IDS_HEADER, durable=True)
+            writer.append(used_ids_path, lambda f: f.write(''.join(f"{user_id}\n" for user_id in missing)))
+        stats['restored_used_ids'] = len(missing)
+
+    total = stats['total_users']
+    stats['average_score'] = round(stats['score_sum'] / total, 1) if total else 0
+    stats['average_percent'] = round(stats['percent_sum'] / total, 1) if total else 0
+    stats['skipped_rows'] = errors
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Восстановление results.json из results.csv")
+    parser.add_argument('--csv', default='results.csv')
+    parser.add_argument('--json', default='results.json')
+    parser.add_argument('--used-ids', default='used_ids.txt', help="пустая строка — не трогать used_ids.txt")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.csv):
+        print(f"Файл {args.csv} не найден")
+        return
+
+    stats = recover(args.csv, args.json, args.used_ids)
+    print(f"Восстановлено результатов: {stats['total_users']} -> {args.json}")
+    if args.used_ids:
+        print(f"Добавлено в {args.used_ids}: {stats['restored_used_ids']}")
+    print(f"Средний балл: {stats['average_score']}, средний процент: {stats['average_percent']}")
+    for line_number, error in stats['skipped_rows']:
+        print(f"  Пропущена строка {line_number}: {error}")
+
+
+if __name__ == '__main__':
+    main()
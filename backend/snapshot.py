@@ -0,0 +1,222 @@
+"""Снапшоты всего состояния олимпиады: ID, сессии, прогресс, результаты.
+
+Формат — gzip с JSON-строками:
+
+    {"format": "olympiad-snapshot", "version": 1, "created": ..., "questions_version": ...}
+    {"k": "valid_id", "v": "8882"}
+    {"k": "result", "v": {...}}
+    ...
+    {"end": true, "count": N, "sha256": "..."}
+
+sha256 считается по всем строкам до завершающей. Снапшот пишется потоково
+прямо из итераторов хранилища и подменяет предыдущий атомарно. Снапшоты не
+инкрементальные: каждый раз пишется всё состояние целиком, но планировщик
+пропускает интервалы, за которые ``storage.revision`` не менялась. Файл без
+завершающей строки или с неверной суммой считается поврежденным.
+Восстановление тоже потоковое: первый проход проверяет сумму, второй
+загружает записи в хранилище пачками.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from atomic_io import AtomicWriter
+
+FORMAT = 'olympiad-snapshot'
+FORMAT_VERSION = 1
+DEFAULT_INTERVAL = 60
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotError(Exception):
+    """Снапшот поврежден или имеет неизвестный формат"""
+
+
+def _encode(obj):
+    return (json.dumps(obj, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def write_snapshot(storage, path, questions_version=None, writer=None):
+    """Пишет снапшот хранилища в path. Возвращает число записей"""
+    header = {
+        'format': FORMAT,
+        'version': FORMAT_VERSION,
+        'created': datetime.now().isoformat(),
+        'backend': storage.name,
+        'questions_version': questions_version,
+    }
+    count = 0
+
+    def write(f):
+        nonlocal count
+        digest = hashlib.sha256()
+        with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=6, mtime=0) as gz:
+            for obj in _records(header, storage.export_records()):
+                line = _encode(obj)
+                digest.update(line)
+                gz.write(line)
+                count += 1
+            gz.write(_encode({'end': True, 'count': count - 1, 'sha256': digest.hexdigest()}))
+
+    (writer or AtomicWriter()).write(path, write, durable=True, binary=True)
+    return count - 1
+
+
+def _records(header, records):
+    yield header
+    for kind, data in records:
+        yield {'k': kind, 'v': data}
+
+
+def _iter_lines(path):
+    try:
+        with gzip.open(path, 'rb') as gz:
+            yield from gz
+    except (OSError, EOFError, zlib.error) as e:
+        raise SnapshotError(f"Снапшот {path} поврежден: {e}")
+
+
+def _decode(line):
+    try:
+        obj = json.loads(line)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise SnapshotError(f"Поврежденная строка снапшота: {e}")
+    if not isinstance(obj, dict):
+        raise SnapshotError("Поврежденная строка снапшота: ожидался объект")
+    return obj
+
+
+def verify_snapshot(path):
+    """Проверяет формат и контрольную сумму. Возвращает (заголовок, число записей)"""
+    digest = hashlib.sha256()
+    header = None
+    trailer = None
+    count = 0
+    for line in _iter_lines(path):
+        if trailer is not None:
+            raise SnapshotError("Данные после завершающей строки снапшота")
+        if line.startswith(b'{"end":'):
+            trailer = _decode(line)
+            continue
+        digest.update(line)
+        if header is None:
+            header = _decode(line)
+            if header.get('format') != FORMAT or header.get('version') != FORMAT_VERSION:
+                raise SnapshotError("Неизвестный формат снапшота")
+        else:
+            count += 1
+
+    if header is None or trailer is None:
+        raise SnapshotError("Снапшот недописан")
+    if trailer.get('sha256') != digest.hexdigest() or trailer.get('count') != count:
+        raise SnapshotError("Контрольная сумма снапшота не совпадает")
+    return header, count
+
+
+def iter_snapshot(path):
+    """Потоково отдает записи снапшота как пары (вид, данные)"""
+    lines = _iter_lines(path)
+    next(lines, None)
+    for line in lines:
+        record = _decode(line)
+        if record.get('end'):
+            return
+        if 'k' not in record or 'v' not in record:
+            raise SnapshotError("Поврежденная запись снапшота")
+        yield record['k'], record['v']
+
+
+def restore_snapshot(storage, path):
+    """Проверяет снапшот и загружает его в хранилище. Возвращает (заголовок, число записей)"""
+    header, _ = verify_snapshot(path)
+    count = storage.import_records(iter_snapshot(path))
+    return header, count
+
+
+class SnapshotScheduler:
+    """Фоновая запись снапшотов по расписанию и восстановление при старте"""
+
+    def __init__(self, storage, path, interval=DEFAULT_INTERVAL, questions_version=None):
+        self.storage = storage
+        self.path = path
+        self.interval = interval
+        self.questions_version = questions_version or (lambda: None)
+        self.writer = AtomicWriter()
+        self.last_revision = None
+        self.last_snapshot = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def snapshot_now(self, path=None):
+        """Пишет снапшот немедленно. Возвращает число записей"""
+        with self._lock:
+            revision = self.storage.revision
+            started = time.monotonic()
+            count = write_snapshot(self.storage, path or self.path, self.questions_version(), self.writer)
+            if path is None or path == self.path:
+                self.last_revision = revision
+                self.last_snapshot = {
+                    'created': datetime.now().isoformat(),
+                    'records': count,
+                    'seconds': round(time.monotonic() - started, 3),
+                }
+            return count
+
+    def restore_if_empty(self):
+        """Восстанавливает состояние из снапшота, если хранилище пустое"""
+        if not os.path.exists(self.path) or not self.storage.is_empty():
+            return None
+        return self.restore()
+
+    def restore(self, path=None):
+        path = path or self.path
+        started = time.monotonic()
+        header, count = restore_snapshot(self.storage, path)
+        if header.get('questions_version') != self.questions_version():
+            logger.warning("Снапшот %s сделан для другой версии questions.txt", path)
+        self.last_revision = self.storage.revision
+        logger.info("Восстановлено %d записей из %s за %.2f с", count, path, time.monotonic() - started)
+        return {'created': header.get('created'), 'records': count,
+                'questions_version': header.get('questions_version')}
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name='snapshot-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, final_snapshot=True):
+        self._stop.set()
+        if final_snapshot and self.storage.revision != self.last_revision:
+            self._safe_snapshot()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            if self.storage.revision != self.last_revision:
+                self._safe_snapshot()
+
+    def _safe_snapshot(self):
+        try:
+            self.snapshot_now()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            logger.exception("Не удалось записать снапшот %s", self.path)
+
+    def status(self):
+        return {
+            'path': self.path,
+            'interval': self.interval,
+            'last_snapshot': self.last_snapshot,
+            'last_error': self.last_error,
+            'pending_changes': self.storage.revision != self.last_revision,
+        }
@@ -0,0 +1,102 @@
+"""Раздача собранного фронтенда (frontend/build) из индекса в памяти.
+
+При старте все файлы сборки читаются один раз, для текстовых форматов
+заранее готовятся gzip- и brotli-версии (brotli — если установлен пакет
+``brotli``), считаются ETag. Файлы с хэшем в имени (``static/js/main.*.js``
+и т.п.) отдаются с ``Cache-Control: immutable`` на год, остальные
+(``index.html``, ``background.jpg``) — с ``no-cache`` и ревалидацией по ETag.
+Неизвестные пути — маршруты SPA — получают ``index.html`` из того же индекса.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import Response, abort, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+INDEX_FILE = 'index.html'
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8,}\.')
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+MIN_COMPRESS_SIZE = 512
+
+
+class Asset:
+    """Файл сборки со всеми вариантами сжатия"""
+
+    __slots__ = ('mimetype', 'cache_control', 'variants')
+
+    def __init__(self, data, mimetype, immutable):
+        self.mimetype = mimetype
+        self.cache_control = IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE
+        digest = hashlib.sha1(data).hexdigest()[:16]
+        # encoding -> (тело, ETag); None — исходный файл
+        self.variants = {None: (data, f'"{digest}"')}
+
+        if len(data) >= MIN_COMPRESS_SIZE and mimetype.startswith(COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < len(data):
+                self.variants['gzip'] = (compressed, f'"{digest}-gz"')
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=11)
+                if len(compressed) < len(data):
+                    self.variants['br'] = (compressed, f'"{digest}-br"')
+
+    def choose(self, accept_encodings):
+        """Выбирает лучший вариант по Accept-Encoding клиента"""
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accept_encodings[encoding]:
+                return encoding
+        return None
+
+
+class StaticAssetIndex:
+    """Индекс всех файлов папки сборки"""
+
+    def __init__(self, root):
+        self.root = root
+        self.assets = {}
+        if os.path.isdir(root):
+            self._scan()
+
+    def _scan(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                full_path = os.path.join(dirpath, filename)
+                path = os.path.relpath(full_path, self.root).replace(os.sep, '/')
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                with open(full_path, 'rb') as f:
+                    data = f.read()
+                immutable = path.startswith('static/') and HASHED_NAME.search(filename) is not None
+                self.assets[path] = Asset(data, mimetype, immutable)
+
+    def __len__(self):
+        return len(self.assets)
+
+    def serve(self, path):
+        """Отдает файл сборки; для неизвестных путей — index.html"""
+        asset = self.assets.get(path) or self.assets.get(INDEX_FILE)
+        if asset is None:
+            abort(404)
+
+        encoding = asset.choose(request.accept_encodings)
+        body, etag = asset.variants[encoding]
+
+        headers = {
+            'Cache-Control': asset.cache_control,
+            'ETag': etag,
+            'Vary': 'Accept-Encoding',
+        }
+        if request.if_none_match.contains_weak(etag.strip('"')):
+            return Response(status=304, headers=headers)
+
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return Response(body, mimetype=asset.mimetype, headers=headers)
@@ -0,0 +1,958 @@
+"""Хранилища состояния олимпиады: ID, сессии, прогресс и результаты.
+
+Все бэкенды реализуют один интерфейс ``Storage``. Нужный выбирается через
+``create_storage`` по имени (переменная окружения ``STORAGE_BACKEND``):
+
+* ``file``   — текстовые/JSON/CSV файлы рядом с приложением (как было раньше);
+* ``sqlite`` — одна база SQLite в режиме WAL с пакетными коммитами;
+* ``memory`` — словари в памяти процесса, для тестов и бенчмарков.
+"""
+import csv
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from itertools import groupby, islice
+
+from atomic_io import AtomicWriter, FSYNC_INTERVAL, write_json_array
+from id_index import SortedIdIndex, merge_into_index
+
+SESSION_TIMEOUT_MINUTES = 2
+ID_BATCH_SIZE = 10000
+
+RESULTS_CSV_HEADER = ['Дата/Время', 'ID Пользователя', 'Баллы', 'Макс. баллы', 'Процент', 'Время', 'Детали ответов']
+USED_IDS_HEADER = '# Здесь будут храниться использованные ID\n'
+
+
+def result_to_csv_row(result):
+    """Превращает запись результата в строку results.csv"""
+    return [
+        result['timestamp'],
+        result['user_id'],
+        result['score'],
+        result['max_score'],
+        result['percent'],
+        result['time'],
+        json.dumps(result['details'], ensure_ascii=False)
+    ]
+
+
+def result_from_csv_row(row):
+    """Обратное к result_to_csv_row: строка results.csv -> запись результата"""
+    timestamp, user_id, score, max_score, percent, time_formatted, details = row
+    minutes, _, seconds = time_formatted.partition(':')
+    return {
+        'timestamp': timestamp,
+        'user_id': user_id,
+        'score': int(score),
+        'max_score': int(max_score),
+        'percent': float(percent),
+        'time': time_formatted,
+        'time_seconds': int(minutes) * 60 + int(seconds),
+        'details': json.loads(details)
+    }
+
+
+def iter_results_csv(filename, errors=None):
+    """Потоково читает results.csv. Битые строки (например, недописанные при
+    падении процесса) пропускаются и, если передан список errors, попадают в него."""
+    if not os.path.exists(filename):
+        return
+    with open(filename, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for line_number, row in enumerate(reader, start=2):
+            if not row:
+                continue
+            try:
+                yield result_from_csv_row(row)
+            except (ValueError, TypeError) as e:
+                if errors is not None:
+                    errors.append((line_number, str(e)))
+
+
+def read_result_chunk(source):
+    """Читает кусок результатов по описанию из Storage.result_chunks.
+
+    Вызывается в процессах пула фоновых задач: каждый сам читает и разбирает
+    свой кусок, веб-процесс передает только описание.
+    """
+    kind = source[0]
+    if kind == 'rows':
+        return source[1]
+    if kind == 'csv':
+        _, filename, start, end = source
+        with open(filename, 'rb') as f:
+            f.seek(start)
+            text = f.read(end - start).decode('utf-8', errors='replace')
+        results = []
+        for row in csv.reader(io.StringIO(text, newline='')):
+            if not row:
+                continue
+            try:
+                results.append(result_from_csv_row(row))
+            except (ValueError, TypeError):
+                # Недописанная строка — как в iter_results_csv
+                continue
+        return results
+    if kind == 'sqlite':
+        _, path, first, last = source
+        conn = sqlite3.connect(path)
+        try:
+            rows = conn.execute('SELECT data FROM results WHERE id BETWEEN ? AND ? ORDER BY id',
+                                (first, last)).fetchall()
+        finally:
+            conn.close()
+        return [json.loads(data) for data, in rows]
+    raise ValueError(f"Неизвестный вид куска результатов: {kind}")
+
+
+def iter_ids_file(filename):
+    """Потоково читает ID из текстового файла (по одному в строке, # — комментарий)"""
+    if not os.path.exists(filename):
+        return
+    with open(filename, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip() and not line.startswith('#'):
+                yield line.strip()
+
+
+def read_ids_file(filename):
+    """Читает ID из текстового файла в множество"""
+    return set(iter_ids_file(filename))
+
+
+class Storage(ABC):
+    """Интерфейс хранилища. Бэкенды реализуют все абстрактные методы ниже."""
+
+    name = None
+
+    def __init__(self, session_timeout_minutes=SESSION_TIMEOUT_MINUTES):
+        self.session_timeout = timedelta(minutes=session_timeout_minutes)
+        # Растет при каждом изменении данных (кроме heartbeat) — по нему
+        # снапшоты понимают, что писать нечего. Увеличивается после записи:
+        # снапшот, начатый посреди записи, запомнит старую ревизию и следующий
+        # снапшот подхватит изменение
+        self.revision = 0
+
+    # --- ID участников ---
+    @abstractmethod
+    def is_valid_id(self, user_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def is_used_id(self, user_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def mark_id_as_used(self, user_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_used_ids(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_valid_ids(self, user_ids):
+        """Добавляет ID из итератора (потоково). Возвращает число новых ID"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def count_valid_ids(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_valid_ids(self):
+        raise NotImplementedError
+
+    # --- Активные сессии ---
+    @abstractmethod
+    def add_session(self, user_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def touch_session(self, user_id):
+        """Обновляет heartbeat; возвращает False, если сессии нет"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove_session(self, user_id):
+        raise NotImplementedError
+
+    def is_session_active(self, user_id):
+        return user_id in self.list_sessions()
+
+    @abstractmethod
+    def list_sessions(self):
+        """Возвращает живые сессии: {user_id: datetime последнего heartbeat}"""
+        raise NotImplementedError
+
+    # --- Прогресс ---
+    @abstractmethod
+    def save_progress(self, user_id, progress):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_progress(self, user_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_progress(self):
+        """Итератор пар (user_id, прогресс)"""
+        raise NotImplementedError
+
+    # --- Результаты ---
+    @abstractmethod
+    def append_result(self, result):
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_results(self):
+        raise NotImplementedError
+
+    def iter_results(self):
+        return iter(self.list_results())
+
+    def result_chunks(self, chunk_size):
+        """Делит результаты на куски примерно по chunk_size для фоновых задач.
+
+        Отдает описания кусков, которые можно передать в другой процесс и
+        прочитать там через read_result_chunk. По умолчанию описание — сами
+        записи; бэкенды с файлом на диске отдают только диапазоны.
+        """
+        results = self.iter_results()
+        while True:
+            chunk = list(islice(results, chunk_size))
+            if not chunk:
+                return
+            yield ('rows', chunk)
+
+    # --- Экспорт и импорт всего состояния (снапшоты) ---
+    def export_records(self):
+        """Потоково отдает всё состояние как пары (вид, данные), сгруппированные по виду"""
+        for user_id in self.iter_valid_ids():
+            yield 'valid_id', user_id
+        for user_id in self.list_used_ids():
+            yield 'used_id', user_id
+        for user_id, timestamp in self.list_sessions().items():
+            yield 'session', {'user_id': user_id, 'last_seen': timestamp.isoformat()}
+        for user_id, progress in self.iter_progress():
+            yield 'progress', {'user_id': user_id, 'data': progress}
+        for result in self.iter_results():
+            yield 'result', result
+
+    @abstractmethod
+    def import_records(self, records):
+        """Загружает пары из export_records в пустое хранилище. Возвращает их число"""
+        raise NotImplementedError
+
+    def is_empty(self):
+        """True, если нет ни результатов, ни использованных ID, ни прогресса"""
+        return not self.list_used_ids() and not self.list_results() and next(self.iter_progress(), None) is None
+
+    # --- Обслуживание ---
+    @abstractmethod
+    def clear(self):
+        """Удаляет результаты, прогресс, сессии и использованные ID"""
+        raise NotImplementedError
+
+    def flush(self):
+        """Сбрасывает на диск всё, что накоплено в буферах"""
+
+    def close(self):
+        self.flush()
+
+    def _is_alive(self, timestamp, now):
+        return now - timestamp < self.session_timeout
+
+
+class MemoryStorage(Storage):
+    """Хранилище в памяти процесса. Данные теряются при перезапуске."""
+
+    name = 'memory'
+
+    def __init__(self, valid_ids=(), **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self._valid_ids = set(valid_ids)
+        self._used_ids = set()
+        self._sessions = {}
+        self._progress = {}
+        self._results = []
+
+    def is_valid_id(self, user_id):
+        return user_id in self._valid_ids
+
+    def is_used_id(self, user_id):
+        return user_id in self._used_ids
+
+    def mark_id_as_used(self, user_id):
+        with self._lock:
+            self._used_ids.add(user_id)
+        self.revision += 1
+
+    def list_used_ids(self):
+        return list(self._used_ids)
+
+    def add_valid_ids(self, user_ids):
+        with self._lock:
+            before = len(self._valid_ids)
+            self._valid_ids.update(user_id.strip() for user_id in user_ids if user_id.strip())
+            added = len(self._valid_ids) - before
+        self.revision += 1
+        return added
+
+    def count_valid_ids(self):
+        return len(self._valid_ids)
+
+    def iter_valid_ids(self):
+        return iter(list(self._valid_ids))
+
+    def add_session(self, user_id):
+        with self._lock:
+            self._sessions[user_id] = datetime.now()
+        self.revision += 1
+
+    def touch_session(self, user_id):
+        now = datetime.now()
+        with self._lock:
+            timestamp = self._sessions.get(user_id)
+            if timestamp is None or not self._is_alive(timestamp, now):
+                return False
+            self._sessions[user_id] = now
+            return True
+
+    def remove_session(self, user_id):
+        with self._lock:
+            self._sessions.pop(user_id, None)
+        self.revision += 1
+
+    def list_sessions(self):
+        now = datetime.now()
+        with self._lock:
+            self._sessions = {user_id: timestamp for user_id, timestamp in self._sessions.items()
+                              if self._is_alive(timestamp, now)}
+            return dict(self._sessions)
+
+    def save_progress(self, user_id, progress):
+        with self._lock:
+            self._progress[user_id] = progress
+        self.revision += 1
+
+    def get_progress(self, user_id):
+        return self._progress.get(user_id)
+
+    def iter_progress(self):
+        return iter(list(self._progress.items()))
+
+    def append_result(self, result):
+        with self._lock:
+            self._results.append(result)
+        self.revision += 1
+
+    def list_results(self):
+        return list(self._results)
+
+    def import_records(self, records):
+        count = 0
+        with self._lock:
+            for kind, data in records:
+                if kind == 'valid_id':
+                    self._valid_ids.add(data)
+                elif kind == 'used_id':
+                    self._used_ids.add(data)
+                elif kind == 'session':
+                    self._sessions[data['user_id']] = datetime.fromisoformat(data['last_seen'])
+                elif kind == 'progress':
+                    self._progress[data['user_id']] = data['data']
+                elif kind == 'result':
+                    self._results.append(data)
+                count += 1
+        self.revision += 1
+        return count
+
+    def clear(self):
+        with self._lock:
+            self._used_ids.clear()
+            self._sessions.clear()
+            self._progress.clear()
+            self._results.clear()
+        self.revision += 1
+
+
+class FileStorage(Storage):
+    """Хранилище в текстовых файлах — прежний формат данных приложения."""
+
+    name = 'file'
+
+    def __init__(self, valid_ids_file='valid_ids.txt', used_ids_file='used_ids.txt',
+                 sessions_file='active_sessions.txt', progress_file='progress.json',
+                 results_file='results.csv', results_json_file='results.json',
+                 valid_ids_index=None, fsync_interval=FSYNC_INTERVAL, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = AtomicWriter(fsync_interval)
+        self.valid_ids_file = valid_ids_file
+        # По умолчанию индекс лежит рядом со своим списком: valid_ids.txt -> valid_ids.idx
+        self.valid_ids_index = SortedIdIndex(valid_ids_index or os.path.splitext(valid_ids_file)[0] + '.idx')
+        self._adding_ids = False
+        self._valid_ids_cache = (None, set())
+        self.used_ids_file = used_ids_file
+        self.sessions_file = sessions_file
+        self.progress_file = progress_file
+        self.results_file = results_file
+        self.results_json_file = results_json_file
+        self._lock = threading.Lock()
+
+        if not os.path.exists(self.results_file):
+            self._write_csv_header()
+        if not os.path.exists(self.results_json_file):
+            self._write_json(self.results_json_file, [], durable=True)
+
+    def _write_csv_header(self):
+        self.writer.write(self.results_file, lambda f: csv.writer(f).writerow(RESULTS_CSV_HEADER),
+                          durable=True, encoding='utf-8-sig', newline='')
+
+    def _read_json(self, filename, default):
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return default
+
+    def _write_json(self, filename, data, indent=None, durable=False):
+        self.writer.write_json(filename, data, durable=durable, indent=indent)
+
+    def _load_results(self):
+        """Читает results.json; если он поврежден — восстанавливает список из results.csv"""
+        try:
+            with open(self.results_json_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except json.JSONDecodeError:
+            return list(iter_results_csv(self.results_file))
+
+    def _valid_ids(self):
+        """Список valid_ids.txt, перечитываемый только при изменении файла"""
+        try:
+            mtime = os.stat(self.valid_ids_file).st_mtime_ns
+        except OSError:
+            return set()
+        if self._valid_ids_cache[0] != mtime:
+            self._valid_ids_cache = (mtime, read_ids_file(self.valid_ids_file))
+        return self._valid_ids_cache[1]
+
+    def _index_ready(self):
+        """True, если есть индекс valid_ids.idx; пересобирает его, если valid_ids.txt новее.
+
+        ID можно дописывать в valid_ids.txt вручную и после provision_ids.py:
+        индекс догонит файл при следующем обращении. Пока add_valid_ids
+        дописывает файл, он всегда новее индекса — тогда индекс не трогаем.
+        """
+        try:
+            index_mtime = os.stat(self.valid_ids_index.path).st_mtime_ns
+        except OSError:
+            return False
+        try:
+            stale = os.stat(self.valid_ids_file).st_mtime_ns > index_mtime
+        except OSError:
+            stale = False
+        if stale and not self._adding_ids:
+            with self._lock:
+                if os.stat(self.valid_ids_file).st_mtime_ns > os.stat(self.valid_ids_index.path).st_mtime_ns:
+                    merge_into_index(self.valid_ids_index, iter_ids_file(self.valid_ids_file), replace=True)
+        return True
+
+    def is_valid_id(self, user_id):
+        # Если собран индекс (provision_ids.py), ищем в нем, иначе — в valid_ids.txt
+        if self._index_ready():
+            return user_id in self.valid_ids_index
+        return user_id in self._valid_ids()
+
+    def is_used_id(self, user_id):
+        return user_id in read_ids_file(self.used_ids_file)
+
+    def mark_id_as_used(self, user_id):
+        with self._lock:
+            self.writer.append(self.used_ids_file, lambda f: f.write(f"{user_id}\n"))
+        self.revision += 1
+
+    def list_used_ids(self):
+        return list(read_ids_file(self.used_ids_file))
+
+    def add_valid_ids(self, user_ids):
+        """Дописывает ID в valid_ids.txt и сливает их в отсортированный индекс"""
+        index_ready = self._index_ready()
+        with self._lock:
+            seed = [] if index_ready else self._valid_ids()
+
+            def tee():
+                yield from seed
+                # Файл закрывается, как только ID кончились, — до подмены
+                # индекса, так что индекс получается новее valid_ids.txt
+                with open(self.valid_ids_file, 'a', encoding='utf-8') as f:
+                    for user_id in user_ids:
+                        f.write(f"{user_id}\n")
+                        yield user_id
+
+            self._adding_ids = True
+            try:
+                added = merge_into_index(self.valid_ids_index, tee())
+            finally:
+                self._adding_ids = False
+        self.revision += 1
+        return added - len(seed)
+
+    def count_valid_ids(self):
+        if self._index_ready():
+            return len(self.valid_ids_index)
+        return len(self._valid_ids())
+
+    def iter_valid_ids(self):
+        if self._index_ready():
+            return iter(self.valid_ids_index)
+        return iter(list(self._valid_ids()))
+
+    def _load_sessions(self):
+        if not os.path.exists(self.sessions_file):
+            return {}
+        sessions = {}
+        with open(self.sessions_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and '|' in line:
+                    user_id, timestamp_str = line.split('|', 1)
+                    sessions[user_id] = datetime.fromisoformat(timestamp_str)
+        return sessions
+
+    def _save_sessions(self, sessions):
+        self.writer.write_text(self.sessions_file, ''.join(
+            f"{user_id}|{timestamp.isoformat()}\n" for user_id, timestamp in sessions.items()))
+
+    def _alive_sessions(self):
+        now = datetime.now()
+        return {user_id: timestamp for user_id, timestamp in self._load_sessions().items()
+                if self._is_alive(timestamp, now)}
+
+    def add_session(self, user_id):
+        with self._lock:
+            sessions = self._alive_sessions()
+            sessions[user_id] = datetime.now()
+            self._save_sessions(sessions)
+        self.revision += 1
+
+    def touch_session(self, user_id):
+        with self._lock:
+            sessions = self._alive_sessions()
+            if user_id not in sessions:
+                return False
+            sessions[user_id] = datetime.now()
+            self._save_sessions(sessions)
+            return True
+
+    def remove_session(self, user_id):
+        with self._lock:
+            sessions = self._load_sessions()
+            if user_id in sessions:
+                del sessions[user_id]
+                self._save_sessions(sessions)
+        self.revision += 1
+
+    def list_sessions(self):
+        return self._alive_sessions()
+
+    def save_progress(self, user_id, progress):
+        with self._lock:
+            all_progress = self._read_json(self.progress_file, {})
+            all_progress[user_id] = progress
+            self._write_json(self.progress_file, all_progress, indent=2)
+        self.revision += 1
+
+    def get_progress(self, user_id):
+        return self._read_json(self.progress_file, {}).get(user_id)
+
+    def iter_progress(self):
+        return iter(self._read_json(self.progress_file, {}).items())
+
+    def append_result(self, result):
+        with self._lock:
+            # results.csv — журнал только на дописывание, results.json из него восстановим
+            all_results = self._load_results()
+            self.writer.append(self.results_file, lambda f: csv.writer(f).writerow(result_to_csv_row(result)),
+                               encoding='utf-8-sig', newline='')
+            all_results.append(result)
+            self._write_json(self.results_json_file, all_results, indent=2, durable=True)
+        self.revision += 1
+
+    def list_results(self):
+        return self._load_results()
+
+    def result_chunks(self, chunk_size):
+        """Куски журнала results.csv как диапазоны байтов.
+
+        Границы ищутся переходом на chunk_size средних строк вперед, так что
+        файл целиком здесь не читается. Строки, дописанные после начала
+        задачи, в нее не попадают.
+        """
+        filename = os.path.abspath(self.results_file)
+        try:
+            size = os.path.getsize(filename)
+        except OSError:
+            return
+        with open(filename, 'rb') as f:
+            f.readline()
+            start = f.tell()
+            sample = list(islice(f, 100))
+            if not sample:
+                return
+            step = max(1, sum(map(len, sample)) // len(sample) * chunk_size)
+            while start < size:
+                f.seek(start + step)
+                f.readline()
+                end = min(f.tell(), size)
+                yield ('csv', filename, start, end)
+                start = end
+
+    def import_records(self, records):
+        """Потоково пишет каждый вид данных в свой файл; результаты — за один проход в CSV и JSON"""
+        count = 0
+
+        def items(group):
+            nonlocal count
+            for _, data in group:
+                count += 1
+                yield data
+
+        for kind, group in groupby(records, key=lambda record: record[0]):
+            if kind == 'valid_id':
+                known = self.valid_ids_index if self._index_ready() else self._valid_ids()
+                self.add_valid_ids(user_id for user_id in items(group) if user_id not in known)
+                continue
+            with self._lock:
+                if kind == 'used_id':
+                    def write_used(f):
+                        f.write(USED_IDS_HEADER)
+                        f.writelines(f"{user_id}\n" for user_id in items(group))
+                    self.writer.write(self.used_ids_file, write_used, durable=True)
+                elif kind == 'session':
+                    self._save_sessions({data['user_id']: datetime.fromisoformat(data['last_seen'])
+                                         for data in items(group)})
+                elif kind == 'progress':
+                    self._write_json(self.progress_file, {data['user_id']: data['data'] for data in items(group)},
+                                     indent=2, durable=True)
+                elif kind == 'result':
+                    def write_results(csv_file):
+                        writer = csv.writer(csv_file)
+                        writer.writerow(RESULTS_CSV_HEADER)
+
+                        def rows():
+                            for result in items(group):
+                                writer.writerow(result_to_csv_row(result))
+                                yield result
+                        self.writer.write(self.results_json_file, lambda f: write_json_array(f, rows()),
+                                          durable=True)
+                    self.writer.write(self.results_file, write_results, durable=True,
+                                      encoding='utf-8-sig', newline='')
+        self.revision += 1
+        return count
+
+    def clear(self):
+        with self._lock:
+            self.writer.write_text(self.used_ids_file, USED_IDS_HEADER, durable=True)
+            self.writer.write_text(self.sessions_file, '', durable=True)
+            self._write_csv_header()
+            self._write_json(self.results_json_file, [], durable=True)
+            self._write_json(self.progress_file, {}, durable=True)
+        self.revision += 1
+
+    def flush(self):
+        self.writer.flush()
+
+
+class SQLiteStorage(Storage):
+    """Хранилище в SQLite.
+
+    База открывается в режиме WAL с ``synchronous=NORMAL``. Все запросы —
+    константные строки, поэтому ``sqlite3`` берёт их из своего кэша
+    подготовленных выражений. Частые записи (heartbeat, прогресс)
+    коммитятся пачками: после ``batch_size`` операций или по таймеру не позже
+    чем через ``batch_interval`` секунд после первой незакоммиченной записи —
+    дольше транзакция не держит блокировку записи в базе. Использованные ID
+    и результаты коммитятся сразу.
+    """
+
+    name = 'sqlite'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS valid_ids (user_id TEXT PRIMARY KEY) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS used_ids (user_id TEXT PRIMARY KEY) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS sessions (user_id TEXT PRIMARY KEY, last_seen REAL NOT NULL) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS progress (user_id TEXT PRIMARY KEY, data TEXT NOT NULL) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS results (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, data TEXT NOT NULL);
+    """
+
+    def __init__(self, path='olympiad.db', valid_ids_file='valid_ids.txt',
+                 batch_size=64, batch_interval=0.5, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._lock = threading.RLock()
+        self._pending = 0
+        self._timer = None
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level='DEFERRED',
+                                     cached_statements=256)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA temp_store=MEMORY')
+        self._conn.executescript(self.SCHEMA)
+
+        if valid_ids_file:
+            self._conn.executemany('INSERT OR IGNORE INTO valid_ids (user_id) VALUES (?)',
+                                   ((user_id,) for user_id in read_ids_file(valid_ids_file)))
+        self._conn.commit()
+
+    def _write(self, sql, params=(), durable=False):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._pending += 1
+            if durable or self._pending >= self.batch_size or self.batch_interval <= 0:
+                self._commit()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.batch_interval, self._timed_commit)
+                self._timer.daemon = True
+                self._timer.start()
+            return cursor
+
+    def _commit(self):
+        self._conn.commit()
+        self._pending = 0
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _timed_commit(self):
+        with self._lock:
+            self._timer = None
+            if self._pending:
+                try:
+                    self._commit()
+                except sqlite3.ProgrammingError:
+                    # База уже закрыта
+                    pass
+
+    def _fetchone(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def _fetchall(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def is_valid_id(self, user_id):
+        return self._fetchone('SELECT 1 FROM valid_ids WHERE user_id = ?', (user_id,)) is not None
+
+    def is_used_id(self, user_id):
+        return self._fetchone('SELECT 1 FROM used_ids WHERE user_id = ?', (user_id,)) is not None
+
+    def mark_id_as_used(self, user_id):
+        self._write('INSERT OR IGNORE INTO used_ids (user_id) VALUES (?)', (user_id,), durable=True)
+        self.revision += 1
+
+    def list_used_ids(self):
+        return [row[0] for row in self._fetchall('SELECT user_id FROM used_ids')]
+
+    def add_valid_ids(self, user_ids):
+        rows = ((user_id.strip(),) for user_id in user_ids if user_id.strip())
+        added = 0
+        with self._lock:
+            while True:
+                batch = list(islice(rows, ID_BATCH_SIZE))
+                if not batch:
+                    break
+                before = self._conn.total_changes
+                self._conn.executemany('INSERT OR IGNORE INTO valid_ids (user_id) VALUES (?)', batch)
+                self._commit()
+                added += self._conn.total_changes - before
+        self.revision += 1
+        return added
+
+    def count_valid_ids(self):
+        return self._fetchone('SELECT COUNT(*) FROM valid_ids')[0]
+
+    def _iter_pages(self, sql, page_size=ID_BATCH_SIZE):
+        """Постранично читает таблицу по ключу (sql с параметрами «после ключа» и «лимит»)"""
+        last = ''
+        while True:
+            rows = self._fetchall(sql, (last, page_size))
+            yield from rows
+            if len(rows) < page_size:
+                return
+            last = rows[-1][0]
+
+    def iter_valid_ids(self):
+        for row in self._iter_pages('SELECT user_id FROM valid_ids WHERE user_id > ? ORDER BY user_id LIMIT ?'):
+            yield row[0]
+
+    def _cutoff(self):
+        return time.time() - self.session_timeout.total_seconds()
+
+    def add_session(self, user_id):
+        self._write('INSERT OR REPLACE INTO sessions (user_id, last_seen) VALUES (?, ?)',
+                    (user_id, time.time()))
+        self.revision += 1
+
+    def touch_session(self, user_id):
+        cursor = self._write('UPDATE sessions SET last_seen = ? WHERE user_id = ? AND last_seen > ?',
+                             (time.time(), user_id, self._cutoff()))
+        return cursor.rowcount > 0
+
+    def remove_session(self, user_id):
+        self._write('DELETE FROM sessions WHERE user_id = ?', (user_id,))
+        self.revision += 1
+
+    def is_session_active(self, user_id):
+        return self._fetchone('SELECT 1 FROM sessions WHERE user_id = ? AND last_seen > ?',
+                              (user_id, self._cutoff())) is not None
+
+    def list_sessions(self):
+        self._write('DELETE FROM sessions WHERE last_seen <= ?', (self._cutoff(),))
+        rows = self._fetchall('SELECT user_id, last_seen FROM sessions')
+        return {user_id: datetime.fromtimestamp(last_seen) for user_id, last_seen in rows}
+
+    def save_progress(self, user_id, progress):
+        self._write('INSERT OR REPLACE INTO progress (user_id, data) VALUES (?, ?)',
+                    (user_id, json.dumps(progress, ensure_ascii=False)))
+        self.revision += 1
+
+    def get_progress(self, user_id):
+        row = self._fetchone('SELECT data FROM progress WHERE user_id = ?', (user_id,))
+        return json.loads(row[0]) if row else None
+
+    def iter_progress(self):
+        for user_id, data in self._iter_pages(
+                'SELECT user_id, data FROM progress WHERE user_id > ? ORDER BY user_id LIMIT ?'):
+            yield user_id, json.loads(data)
+
+    def append_result(self, result):
+        self._write('INSERT INTO results (user_id, data) VALUES (?, ?)',
+                    (result['user_id'], json.dumps(result, ensure_ascii=False)), durable=True)
+        self.revision += 1
+
+    def list_results(self):
+        return [json.loads(row[0]) for row in self._fetchall('SELECT data FROM results ORDER BY id')]
+
+    def iter_results(self):
+        last = 0
+        while True:
+            rows = self._fetchall('SELECT id, data FROM results WHERE id > ? ORDER BY id LIMIT ?',
+                                  (last, ID_BATCH_SIZE))
+            for _, data in rows:
+                yield json.loads(data)
+            if len(rows) < ID_BATCH_SIZE:
+                return
+            last = rows[-1][0]
+
+    def result_chunks(self, chunk_size):
+        """Куски таблицы results как диапазоны id: строки читает сам обработчик"""
+        if self.path == ':memory:':
+            yield from super().result_chunks(chunk_size)
+            return
+        self.flush()
+        first, last = self._fetchone('SELECT MIN(id), MAX(id) FROM results')
+        if first is None:
+            return
+        path = os.path.abspath(self.path)
+        for start in range(first, last + 1, chunk_size):
+            yield ('sqlite', path, start, min(start + chunk_size - 1, last))
+
+    def is_empty(self):
+        return self._fetchone('SELECT EXISTS (SELECT 1 FROM used_ids) OR EXISTS (SELECT 1 FROM results)'
+                              ' OR EXISTS (SELECT 1 FROM progress)')[0] == 0
+
+    IMPORT_SQL = {
+        'valid_id': ('INSERT OR IGNORE INTO valid_ids (user_id) VALUES (?)', lambda data: (data,)),
+        'used_id': ('INSERT OR IGNORE INTO used_ids (user_id) VALUES (?)', lambda data: (data,)),
+        'session': ('INSERT OR REPLACE INTO sessions (user_id, last_seen) VALUES (?, ?)',
+                    lambda data: (data['user_id'], datetime.fromisoformat(data['last_seen']).timestamp())),
+        'progress': ('INSERT OR REPLACE INTO progress (user_id, data) VALUES (?, ?)',
+                     lambda data: (data['user_id'], json.dumps(data['data'], ensure_ascii=False))),
+        'result': ('INSERT INTO results (user_id, data) VALUES (?, ?)',
+                   lambda data: (data['user_id'], json.dumps(data, ensure_ascii=False))),
+    }
+
+    def import_records(self, records):
+        """Вставляет записи пачками через executemany в одной транзакции"""
+        count = 0
+        with self._lock:
+            for kind, group in groupby(records, key=lambda record: record[0]):
+                sql, to_row = self.IMPORT_SQL[kind]
+                rows = (to_row(data) for _, data in group)
+                while True:
+                    batch = list(islice(rows, ID_BATCH_SIZE))
+                    if not batch:
+                        break
+                    self._conn.executemany(sql, batch)
+                    count += len(batch)
+            self._commit()
+        self.revision += 1
+        return count
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM used_ids')
+            self._conn.execute('DELETE FROM sessions')
+            self._conn.execute('DELETE FROM progress')
+            self._conn.execute('DELETE FROM results')
+            self._commit()
+        self.revision += 1
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._commit()
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._conn.close()
+
+
+BACKENDS = {
+    'file': FileStorage,
+    'sqlite': SQLiteStorage,
+    'memory': MemoryStorage,
+}
+
+
+FILE_OPTIONS = ('used_ids_file', 'sessions_file', 'progress_file', 'results_file', 'results_json_file',
+                'valid_ids_index')
+
+
+def create_storage(backend=None, **options):
+    """Создает хранилище по имени бэкенда (по умолчанию из STORAGE_BACKEND).
+
+    Пути к файлам можно передавать для любого бэкенда: те, что бэкенду не
+    нужны, отбрасываются.
+    """
+    backend = (backend or os.environ.get('STORAGE_BACKEND', 'file')).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд хранилища: {backend}")
+
+    if backend != 'file':
+        for key in FILE_OPTIONS:
+            options.pop(key, None)
+
+    if backend == 'sqlite':
+        options.setdefault('path', os.environ.get('STORAGE_PATH', 'olympiad.db'))
+        options.setdefault('batch_size', int(os.environ.get('SQLITE_BATCH_SIZE', 64)))
+        options.setdefault('batch_interval', float(os.environ.get('SQLITE_BATCH_INTERVAL', 0.5)))
+    elif backend == 'memory':
+        options.setdefault('valid_ids', read_ids_file(options.pop('valid_ids_file', 'valid_ids.txt')))
+
+    return BACKENDS[backend](**options)
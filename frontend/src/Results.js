@@ -13,10 +13,18 @@ function Results() {
     loadStats();
   }, []);
 
+  // Статистика считается фоновой задачей: ставим ее и ждем результата
   const loadStats = async () => {
     try {
-      const response = await axios.get(`${API_URL}/results/stats`);
-      setStats(response.data);
+      let { data: job } = await axios.post(`${API_URL}/admin/jobs`, { type: 'stats' });
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        ({ data: job } = await axios.get(`${API_URL}/admin/jobs/${job.id}`));
+      }
+      if (job.status !== 'done') {
+        throw new Error(job.error);
+      }
+      setStats(job.result);
       setLoading(false);
     } catch (error) {
       console.error('Ошибка загрузки статистики:', error);
@@ -103,7 +111,13 @@ function Results() {
       </div>
 
       <div className="results-table-container">
-        <h2>Детальные результаты</h2>
+        <h2>Последние результаты</h2>
+        {stats.recent_results.length < stats.total_users && (
+          <p className="results-note">
+            Показаны последние {stats.recent_results.length} из {stats.total_users}.
+            Все результаты — кнопки «Скачать CSV» и «Скачать JSON».
+          </p>
+        )}
         <table className="results-table">
           <thead>
             <tr>
@@ -115,7 +129,7 @@ function Results() {
             </tr>
           </thead>
           <tbody>
-            {stats.results.map((result, index) => (
+            {stats.recent_results.map((result, index) => (
               <tr key={index}>
                 <td>{result.timestamp}</td>
                 <td>{result.user_id}</td>